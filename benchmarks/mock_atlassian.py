@@ -0,0 +1,341 @@
+"""
+A local stand-in for the Confluence and Jira Cloud REST endpoints the connectors use:
+
+    GET /rest/api/search                Confluence CQL search (cursor paging via _links.next)
+    GET /rest/api/content/search        bulk body fetch ("id IN (...)")
+    GET /rest/api/content/<id>          single page (get_page_by_id)
+    GET /rest/api/2/search/jql          Jira JQL search (nextPageToken paging)
+    GET /rest/api/2/issue/<key>         single Jira issue
+
+The site is generated deterministically: page i mentions ticket NB_<i % tickets> and two
+of the EMPLOYEES. CQL/JQL support is limited to what the connectors send: quoted
+text/siteSearch terms (OR'd), id [NOT] IN, key IN and assignee/reporter equality.
+Latency, result page size and 429 injection are configurable, and every request is
+counted per endpoint.
+"""
+import re
+import json
+import time
+import threading
+from urllib.parse import parse_qs, urlencode, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMPLOYEES = [
+    "Alice Martin", "Bob Chen", "Carla Diaz", "David Okafor", "Eva Novak",
+    "Farid Haddad", "Grace Kim", "Hugo Lefevre", "Ines Costa", "Jonas Berg",
+    "Kara Singh", "Liam Walsh", "Mina Sato", "Nils Dahl", "Olga Petrova",
+    "Pedro Alves", "Qi Zhang", "Rosa Romero", "Sam Taylor", "Tara Nolan",
+]
+
+_FILLER = (
+    "The service owns onboarding workflows and the runbook lists escalation steps, "
+    "dashboards, alert thresholds and the rollback procedure for each release train. "
+)
+
+_TERM = re.compile(r'(?:text|siteSearch|title)\s*~\s*"((?:\\.|[^"\\])*)"')
+_ID_IN = re.compile(r'\bid\s+IN\s*\(([^)]*)\)', re.I)
+_ID_NOT_IN = re.compile(r'\bid\s+NOT\s+IN\s*\(([^)]*)\)', re.I)
+_KEY_IN = re.compile(r'\bkey\s+IN\s*\(([^)]*)\)', re.I)
+_PERSON = re.compile(r'(?:assignee|reporter)\s*=\s*"([^"]*)"')
+
+
+def ticket_id(number):
+    return f"NB_{number:04d}"
+
+
+def _email(name):
+    return name.lower().replace(" ", ".") + "@example.com"
+
+
+class MockSite:
+    """The generated pages and issues served by MockAtlassian."""
+
+    def __init__(self, pages=100, body_kb=4, tickets=None, first_id=100000):
+        self.ticket_count = tickets or max(1, pages // 10)
+        self.pages = []
+        for i in range(1, pages + 1):
+            page_id = str(first_id + i)
+            owner = EMPLOYEES[i % len(EMPLOYEES)]
+            reviewer = EMPLOYEES[(i * 7) % len(EMPLOYEES)]
+            ticket = ticket_id(i % self.ticket_count + 1)
+            body = self._body(i, ticket, owner, reviewer, body_kb)
+            self.pages.append({
+                "id": page_id,
+                "type": "page",
+                "title": f"{ticket} runbook part {i}",
+                "version": {"number": 1 + i % 3, "when": "2024-01-01T10:00:00.000Z"},
+                "_links": {"webui": f"/spaces/BENCH/pages/{page_id}"},
+                "body": {"storage": {"value": body, "representation": "storage"}},
+                "_text": body.lower(),
+            })
+        self.by_id = {page["id"]: page for page in self.pages}
+        self.issues = [
+            {
+                "key": ticket_id(n),
+                "fields": {
+                    "summary": f"Ticket {ticket_id(n)}",
+                    "description": _FILLER,
+                    "status": {"name": "Done" if n % 2 else "In Progress"},
+                    "assignee": {"displayName": EMPLOYEES[n % len(EMPLOYEES)],
+                                 "emailAddress": _email(EMPLOYEES[n % len(EMPLOYEES)])},
+                    "reporter": {"displayName": EMPLOYEES[(n * 3) % len(EMPLOYEES)],
+                                 "emailAddress": _email(EMPLOYEES[(n * 3) % len(EMPLOYEES)])},
+                    "created": "2024-01-01T10:00:00.000+0000",
+                    "updated": f"2024-02-{1 + n % 28:02d}T10:00:00.000+0000",
+                },
+            }
+            for n in range(1, self.ticket_count + 1)
+        ]
+
+    @staticmethod
+    def _body(i, ticket, owner, reviewer, body_kb):
+        parts = [
+            f"<h1>Runbook {i}</h1>",
+            f"<p>Tracking ticket {ticket}. Owner: {owner} ({_email(owner)}). Reviewed by {reviewer}.</p>",
+            f"<table><tr><th>Ticket</th><th>Owner</th></tr><tr><td>{ticket}</td><td>{owner}</td></tr></table>",
+            "<ac:structured-macro ac:name=\"code\"><ac:parameter ac:name=\"language\">bash</ac:parameter>"
+            "<ac:plain-text-body><![CDATA[kubectl rollout undo deploy/api\n  --to-revision=2]]>"
+            "</ac:plain-text-body></ac:structured-macro>",
+        ]
+        size = sum(len(part) for part in parts)
+        while size < body_kb * 1024:
+            parts.append(f"<p>{_FILLER}</p>")
+            size += len(_FILLER) + 7
+        return "".join(parts)
+
+    def search(self, cql):
+        terms = [term.replace('\\"', '"').strip('"').lower() for term in _TERM.findall(cql)]
+        only = _ids(_ID_IN, cql)
+        excluded = _ids(_ID_NOT_IN, cql) or set()
+        results = []
+        for page in self.pages:
+            if only is not None and page["id"] not in only:
+                continue
+            if page["id"] in excluded:
+                continue
+            if terms and not any(term in page["_text"] for term in terms):
+                continue
+            results.append(page)
+        return results
+
+    def search_issues(self, jql):
+        keys = _ids(_KEY_IN, jql)
+        people = {person.lower() for person in _PERSON.findall(jql)}
+        results = []
+        for issue in self.issues:
+            if keys is not None and issue["key"] not in keys:
+                continue
+            if people:
+                fields = issue["fields"]
+                names = {
+                    value.lower()
+                    for user in (fields["assignee"], fields["reporter"])
+                    for value in (user["displayName"], user["emailAddress"])
+                }
+                if not people & names:
+                    continue
+            results.append(issue)
+        return results
+
+
+def _ids(pattern, query):
+    match = pattern.search(query)
+    if match is None:
+        return None
+    return {part.strip().strip('"') for part in match.group(1).split(",") if part.strip()}
+
+
+def _content(page, expand):
+    """Serializes a page with only the expansions that were asked for."""
+    content = {key: value for key, value in page.items() if key not in ("body", "version", "_text")}
+    if "version" in expand:
+        content["version"] = page["version"]
+    if "body.storage" in expand:
+        content["body"] = page["body"]
+    return content
+
+
+class MockAtlassian:
+    """
+    Runs a MockSite on a local ThreadingHTTPServer.
+
+    latency: seconds added to every response
+    max_limit: cap on results per search response, forcing cursor paging
+    throttle_every: every Nth request is answered with 429 (0 = never)
+    retry_after: value of the Retry-After header on injected 429s
+    """
+
+    def __init__(self, site, latency=0.0, max_limit=100, throttle_every=0, retry_after="0"):
+        self.site = site
+        self.latency = latency
+        self.max_limit = max_limit
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.requests = {}
+        self.throttled = 0
+        self.bytes_sent = 0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        mock = self
+
+        class Handler(_Handler):
+            server_mock = mock
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mock-atlassian", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def snapshot(self):
+        """Returns a copy of the request counters."""
+        with self._lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "requests_by_endpoint": dict(self.requests),
+                "throttled": self.throttled,
+                "bytes": self.bytes_sent,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.throttled = 0
+            self.bytes_sent = 0
+            self._count = 0
+
+    def _record(self, endpoint):
+        """Counts a request. Returns True if it should be throttled."""
+        with self._lock:
+            self._count += 1
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            throttle = bool(self.throttle_every) and self._count % self.throttle_every == 0
+            if throttle:
+                self.throttled += 1
+            return throttle
+
+    def _sent(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+    # --- endpoint handlers: return (status, payload) ---
+
+    def cql_search(self, params):
+        cql = params.get("cql", "")
+        start = int(params.get("cursor") or params.get("start") or 0)
+        limit = min(int(params.get("limit") or 25), self.max_limit)
+        expand = params.get("expand") or ""
+        matches = self.site.search(cql)
+        batch = matches[start:start + limit]
+        expansions = expand.replace("content.", "")
+        response = {
+            "results": [{"content": _content(page, expansions), "title": page["title"]} for page in batch],
+            "start": start,
+            "limit": limit,
+            "size": len(batch),
+            "totalSize": len(matches),
+            "_links": {},
+        }
+        if start + limit < len(matches):
+            query = urlencode({"cql": cql, "cursor": start + limit, "limit": limit, "expand": expand})
+            response["_links"]["next"] = f"/rest/api/search?{query}"
+        return 200, response
+
+    def content_search(self, params):
+        limit = min(int(params.get("limit") or 25), self.max_limit)
+        matches = self.site.search(params.get("cql", ""))[:limit]
+        expand = params.get("expand") or ""
+        return 200, {"results": [_content(page, expand) for page in matches], "size": len(matches)}
+
+    def content(self, page_id, params):
+        page = self.site.by_id.get(page_id)
+        if page is None:
+            return 404, {"message": f"No content found with id {page_id}"}
+        return 200, _content(page, params.get("expand") or "")
+
+    def jql_search(self, params):
+        issues = self.site.search_issues(params.get("jql", ""))
+        start = int(params.get("nextPageToken") or 0)
+        limit = min(int(params.get("maxResults") or 50), self.max_limit)
+        batch = issues[start:start + limit]
+        is_last = start + limit >= len(issues)
+        response = {"issues": batch, "isLast": is_last}
+        if not is_last:
+            response["nextPageToken"] = str(start + limit)
+        return 200, response
+
+    def issue(self, key):
+        for issue in self.site.issues:
+            if issue["key"] == key:
+                return 200, issue
+        return 404, {"errorMessages": [f"Issue {key} does not exist"]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_mock = None
+
+    def do_GET(self):
+        mock = self.server_mock
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip("/")
+        if path.startswith("/wiki/"):
+            path = path[len("/wiki"):]
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+
+        if path == "/rest/api/search":
+            endpoint, handler = "cql", lambda: mock.cql_search(params)
+        elif path == "/rest/api/content/search":
+            endpoint, handler = "content_search", lambda: mock.content_search(params)
+        elif path.startswith("/rest/api/content/"):
+            page_id = path.rsplit("/", 1)[-1]
+            endpoint, handler = "content", lambda: mock.content(page_id, params)
+        elif path.endswith("/search/jql"):
+            endpoint, handler = "jql", lambda: mock.jql_search(params)
+        elif "/rest/api/2/issue/" in path:
+            key = path.rsplit("/", 1)[-1]
+            endpoint, handler = "issue", lambda: mock.issue(key)
+        else:
+            endpoint, handler = "unknown", lambda: (404, {"message": f"Unknown endpoint {path}"})
+
+        throttled = mock._record(endpoint)
+        if mock.latency:
+            time.sleep(mock.latency)
+        if throttled:
+            self._reply(429, {"message": "Rate limit exceeded"}, {"Retry-After": mock.retry_after})
+            return
+        status, payload = handler()
+        self._reply(status, payload)
+
+    def _reply(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server_mock._sent(len(body))
+
+    def log_message(self, format, *args):
+        pass
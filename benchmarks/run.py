@@ -0,0 +1,287 @@
+"""
+Offline benchmarks for the connectors and the RAG chain against benchmarks.mock_atlassian.
+
+    python -m benchmarks.run --sizes 10 100 1000 --output bench.json
+    python -m benchmarks.run --latency 0.02 --throttle-every 10 --baseline bench.json
+
+Each case is timed over --repeat runs (the first, cold run is reported separately
+from the median), then run once more under tracemalloc for peak memory. Request
+counts and bytes come from the mock server.
+With --baseline, the run fails if requests, wall time or memory regressed by more
+than --tolerance.
+
+Cold-start cost is tracked too: each module in IMPORT_BUDGETS_MS is imported in a
+fresh interpreter under `python -X importtime`, and the run fails if one exceeds its
+budget (or, with --baseline, regressed beyond --tolerance).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+
+from benchmarks.mock_atlassian import EMPLOYEES, MockAtlassian, MockSite, ticket_id
+
+# Metrics compared against a baseline, and whether they are exact counts
+REGRESSION_METRICS = {"requests": True, "wall_seconds": False, "peak_memory_bytes": False}
+
+# Cumulative cold-import time allowed for the entry points a tool container or the
+# CLI loads before doing any work (src.tools includes the Orchestrate SDK)
+IMPORT_BUDGETS_MS = {
+    "src.tools": 1500,
+    "src.main": 250,
+    "src.connectors.confluence_loader": 100,
+    "src.connectors.jira_loader": 100,
+}
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _fresh_connector(url, **kwargs):
+    from src.connectors.confluence_loader import ConfluenceConnector
+    return ConfluenceConnector(url, "bench@example.com", "bench-token", **kwargs)
+
+
+def _fake_rag_chain():
+    """A RAGChain whose LLM returns a canned answer, so only our own code is measured."""
+    from langchain_core.language_models import FakeListChatModel
+    from langchain_core.output_parsers import StrOutputParser
+    from src.rag.chain import RAGChain
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    chain = RAGChain()
+    chain.llm = FakeListChatModel(responses=["The runbook's rollback procedure applies."])
+    chain.chain = chain.prompt | chain.llm | StrOutputParser()
+    return chain
+
+
+def build_cases(url, size):
+    """Returns [(name, setup)] where setup() returns the callable to measure."""
+    from src.connectors.jira_loader import JiraConnector
+    from src.main import get_ticket_context
+
+    tickets = ",".join(ticket_id(n) for n in range(1, min(5, max(1, size // 10)) + 1))
+
+    def search_pages():
+        connector = _fresh_connector(url)
+        return lambda: connector.search_pages("runbook", limit=size)
+
+    def search_employee_contributor():
+        connector = _fresh_connector(url)
+        return lambda: connector.search_employee_contributor(EMPLOYEES[1], limit=size)
+
+    def search_contributors_many():
+        connector = _fresh_connector(url)
+        return lambda: connector.search_contributors(EMPLOYEES[:10], limit=size)
+
+    def search_contributors_spill():
+        connector = _fresh_connector(url)
+        return lambda: connector.search_contributors(EMPLOYEES[:10], limit=size, spill=True)
+
+    def ticket_context():
+        os.environ.update(CONFLUENCE_URL=url, ATLASSIAN_USERNAME="bench@example.com", ATLASSIAN_API_TOKEN="bench-token")
+        return lambda: get_ticket_context(tickets)
+
+    def jira_employee_history():
+        jira = JiraConnector(url, "bench@example.com", "bench-token")
+        return lambda: jira.get_employee_history(EMPLOYEES[1])
+
+    def format_docs():
+        docs = list(_fresh_connector(url).iter_pages("runbook", page_size=100, max_pages=size))
+        chain = _fake_rag_chain()
+        return lambda: chain.format_docs(docs, "How do I roll back?", {"summary": "Rollback"})
+
+    def answer():
+        docs = list(_fresh_connector(url).iter_pages("runbook", page_size=100, max_pages=size))
+        chain = _fake_rag_chain()
+        return lambda: chain.answer("How do I roll back?", {"summary": "Rollback", "description": ""}, context_docs=docs)
+
+    return [
+        ("search_pages", search_pages),
+        ("search_employee_contributor", search_employee_contributor),
+        ("search_contributors_10", search_contributors_many),
+        ("search_contributors_10_spill", search_contributors_spill),
+        ("get_ticket_context", ticket_context),
+        ("jira_employee_history", jira_employee_history),
+        ("format_docs", format_docs),
+        ("answer", answer),
+    ]
+
+
+def run_case(mock, setup, repeat):
+    func = setup()
+    mock.reset()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    counts = mock.snapshot()
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "wall_seconds": round(statistics.median(timings), 6),
+        "wall_seconds_first": round(timings[0], 6),
+        "wall_seconds_min": round(min(timings), 6),
+        "requests": counts["requests"] // repeat,
+        "requests_by_endpoint": {key: value // repeat for key, value in counts["requests_by_endpoint"].items()},
+        "throttled": counts["throttled"] // repeat,
+        "bytes": counts["bytes"] // repeat,
+        "peak_memory_bytes": peak,
+    }
+
+
+def _import_times(module):
+    """Imports module in a fresh interpreter; returns {package: (self_us, cumulative_us)}."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure_imports(budgets=None, runs=3):
+    """
+    Returns one result per module with its best-of-runs cumulative import time, the
+    budget, and the five packages that cost the most to import along the way.
+    """
+    results = []
+    for module, budget in (budgets or IMPORT_BUDGETS_MS).items():
+        samples = [_import_times(module) for _ in range(runs)]
+        best = min(samples, key=lambda times: times.get(module, (0, 0))[1])
+        import_ms = best.get(module, (0, 0))[1] / 1000
+        slowest = sorted(
+            ((name, round(self_us / 1000, 2)) for name, (self_us, _) in best.items()),
+            key=lambda item: item[1], reverse=True,
+        )[:5]
+        results.append({
+            "module": module,
+            "import_ms": round(import_ms, 2),
+            "budget_ms": budget,
+            "over_budget": import_ms > budget,
+            "modules_loaded": len(best),
+            "slowest_self_ms": slowest,
+        })
+    return results
+
+
+def run(sizes, latency=0.0, throttle_every=0, max_limit=100, body_kb=4, repeat=3, only=None, log=sys.stderr):
+    # Keep the benchmark hermetic: no on-disk page cache, LLM response cache or local
+    # index, and no client-side rate limit (read when src.connectors.fetch_pool is first imported)
+    os.environ["HRABBIT_PAGE_CACHE"] = "0"
+    os.environ["HRABBIT_LLM_CACHE"] = "0"
+    os.environ.pop("HRABBIT_INDEX_PATH", None)
+    os.environ.setdefault("ATLASSIAN_RATE_LIMIT", "0")
+
+    results = []
+    for size in sizes:
+        # Page ids differ between sizes so in-process caches never carry over
+        site = MockSite(pages=size, body_kb=body_kb, first_id=size * 1000000)
+        with MockAtlassian(site, latency=latency, max_limit=max_limit, throttle_every=throttle_every) as mock:
+            for name, setup in build_cases(mock.url, size):
+                if only and name not in only:
+                    continue
+                result = {"case": name, "pages": size, **run_case(mock, setup, repeat)}
+                results.append(result)
+                print(f"{name:<28} {size:>5} pages  {result['wall_seconds'] * 1000:9.1f} ms  "
+                      f"{result['requests']:>4} req  {result['peak_memory_bytes'] / 1e6:7.2f} MB", file=log)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "latency": latency,
+            "throttle_every": throttle_every,
+            "max_limit": max_limit,
+            "body_kb": body_kb,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, tolerance):
+    """Returns a list of human-readable regressions of current against baseline."""
+    previous = {(r["case"], r["pages"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        before = previous.get((result["case"], result["pages"]))
+        if before is None:
+            continue
+        for metric, exact in REGRESSION_METRICS.items():
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            limit = old if exact else old * (1 + tolerance)
+            if new > limit:
+                regressions.append(f"{result['case']} @ {result['pages']} pages: {metric} {old} -> {new}")
+
+    previous_imports = {r["module"]: r for r in baseline.get("imports", [])}
+    for result in current.get("imports", []):
+        before = previous_imports.get(result["module"])
+        if before is not None and result["import_ms"] > before["import_ms"] * (1 + tolerance):
+            regressions.append(f"import {result['module']}: import_ms {before['import_ms']} -> {result['import_ms']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline connector and RAG benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="Pages in the mock site")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every mock response")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Answer every Nth request with 429")
+    parser.add_argument("--max-limit", type=int, default=100, help="Maximum results per search response")
+    parser.add_argument("--body-kb", type=int, default=4, help="Approximate size of each page body")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument("--case", action="append", help="Only run this case (repeatable)")
+    parser.add_argument("--skip-imports", action="store_true", help="Don't measure cold import times")
+    parser.add_argument("--output", help="Write results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative increase in wall time and memory against the baseline")
+    args = parser.parse_args()
+
+    report = run(args.sizes, latency=args.latency, throttle_every=args.throttle_every,
+                 max_limit=args.max_limit, body_kb=args.body_kb, repeat=args.repeat, only=args.case)
+    failures = []
+    if not args.skip_imports:
+        report["imports"] = measure_imports()
+        for result in report["imports"]:
+            print(f"import {result['module']:<34} {result['import_ms']:9.1f} ms  "
+                  f"(budget {result['budget_ms']} ms)", file=sys.stderr)
+            if result["over_budget"]:
+                failures.append(f"import {result['module']}: {result['import_ms']} ms over "
+                                f"its {result['budget_ms']} ms budget")
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures.extend(compare(json.load(f), report, args.tolerance))
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
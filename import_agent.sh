@@ -44,7 +44,7 @@ fi
 
 # # Import the tools with connection association
 echo -e "${YELLOW}Importing Confluence tools...${NC}"
-orchestrate tools import -k python -f "${SCRIPT_DIR}/src/tools.py" -r "${SCRIPT_DIR}/requirements.txt" --app-id confluence_creds
+orchestrate tools import -k python -f "${SCRIPT_DIR}/src/tools.py" -p "${SCRIPT_DIR}" -r "${SCRIPT_DIR}/requirements.txt" --app-id confluence_creds
 
 # Import the agent
 echo -e "${YELLOW}Importing Confluence agent...${NC}"
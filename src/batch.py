@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.connectors.fetch_pool import TokenBucket
+
+DEFAULT_BATCH_WORKERS = int(os.getenv("HRABBIT_BATCH_WORKERS", "4"))
+DEFAULT_BATCH_RATE = float(os.getenv("HRABBIT_BATCH_RATE", "2"))
+
+# Characters of each page kept in batch results
+EXCERPT_CHARS = 500
+
+KINDS = ("ticket", "employee")
+
+
+def parse_items(lines):
+    """
+    Parses batch input into (kind, value) pairs. Each line is either "ticket:ID",
+    "employee:Name or email", a JSON object with a "ticket" or "employee" key, or a
+    bare ticket ID. Blank lines and lines starting with '#' are ignored; duplicates
+    are dropped.
+    """
+    items = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            kind = next((k for k in KINDS if record.get(k)), None)
+            if kind is None:
+                raise ValueError(f"Batch input line has no 'ticket' or 'employee': {line}")
+            items.append((kind, str(record[kind]).strip()))
+            continue
+        kind, sep, value = line.partition(":")
+        if sep and kind.strip().lower() in KINDS:
+            items.append((kind.strip().lower(), value.strip()))
+        else:
+            items.append(("ticket", line))
+    return list(dict.fromkeys(item for item in items if item[1]))
+
+
+def item_key(kind, value):
+    return f"{kind}:{value}"
+
+
+def load_checkpoint(path):
+    """Returns the set of item keys recorded as done in the checkpoint file."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def ticket_record(confluence, ticket_id):
+    """
+    Builds a ticket's batch result, {"status": "not_found"} if no Confluence page mentions
+    it. Connector errors propagate (the connectors raise after retries instead of returning
+    empty results), so the item is failed and retried on the next run rather than
+    checkpointed as not found.
+    """
+    context = confluence.get_ticket_contexts([ticket_id]).get(ticket_id) or {}
+    ticket = context.get("ticket")
+    if not ticket:
+        return {"status": "not_found"}
+    return {
+        "summary": ticket["summary"],
+        "page_id": ticket.get("page_id"),
+        "pages": [
+            {
+                "page_id": doc.metadata["page_id"],
+                "title": doc.metadata["title"],
+                "source": doc.metadata["source"],
+                "excerpt": doc.page_content[:EXCERPT_CHARS],
+            }
+            for doc in context.get("docs", [])
+        ],
+    }
+
+
+def employee_record(confluence, jira, employee):
+    """
+    Builds an employee's batch result: contributor pages and, with Jira, their issue
+    history. As for tickets, a failed search fails the item instead of recording no pages.
+    """
+    record = {"pages": confluence.search_contributors([employee])[employee]}
+    if jira is not None:
+        record["issues"] = jira.get_employee_history(employee)
+    return record
+
+
+def run_batch(items, confluence, output_path, jira=None, checkpoint_path=None,
+              workers=None, rate=None, log=sys.stderr):
+    """
+    Processes (kind, value) items through a worker pool and appends one JSON line per
+    item to output_path as soon as it finishes. A shared token bucket caps how many
+    items start per second across all workers.
+
+    Items that succeed are appended to the checkpoint file (default: output_path +
+    '.checkpoint') after their result is written; items already listed there are
+    skipped, so an interrupted or partly failed run can simply be started again.
+    Failed items are written with an "error" field and retried on the next run.
+
+    Returns a dict with counts of done, failed and skipped items.
+    """
+    checkpoint_path = checkpoint_path or output_path + ".checkpoint"
+    done = load_checkpoint(checkpoint_path)
+    pending = [item for item in items if item_key(*item) not in done]
+    limiter = TokenBucket(DEFAULT_BATCH_RATE if rate is None else rate, burst=1)
+    counts = {"done": 0, "failed": 0, "skipped": len(items) - len(pending)}
+
+    def process(item):
+        kind, value = item
+        limiter.acquire()
+        started = time.perf_counter()
+        if kind == "ticket":
+            result = ticket_record(confluence, value)
+        else:
+            result = employee_record(confluence, jira, value)
+        return result, time.perf_counter() - started
+
+    if counts["skipped"]:
+        print(f"Skipping {counts['skipped']} item(s) already in {checkpoint_path}", file=log)
+
+    with open(output_path, "a", encoding="utf-8") as out, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=workers or DEFAULT_BATCH_WORKERS) as pool:
+        futures = {pool.submit(process, item): item for item in pending}
+        for future in as_completed(futures):
+            kind, value = futures[future]
+            line = {"kind": kind, "id": value}
+            try:
+                result, seconds = future.result()
+                line.update(result, seconds=round(seconds, 3))
+            except Exception as e:
+                line["error"] = str(e)
+            # default=str writes contributor snippets (TextViews) as their text
+            out.write(json.dumps(line, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            if "error" in line:
+                counts["failed"] += 1
+                print(f"[failed] {item_key(kind, value)}: {line['error']}", file=log)
+                continue
+            # The result is on disk before the item is marked done
+            checkpoint.write(item_key(kind, value) + "\n")
+            checkpoint.flush()
+            counts["done"] += 1
+            print(f"[{counts['done'] + counts['failed']}/{len(pending)}] {item_key(kind, value)}", file=log)
+
+    return counts
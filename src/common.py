@@ -0,0 +1,50 @@
+"""
+Helpers shared by the command line (src.main) and the Orchestrate tools (src.tools):
+the local caches handed to every ConfluenceConnector, and the plain-text ticket context.
+"""
+from src.connectors.page_cache import PageCache
+from src.index.hybrid import HybridRetriever
+from src.index.space_index import SpaceIndex
+
+
+def connector_kwargs():
+    """Returns the ConfluenceConnector kwargs for the on-disk page cache, synced search index and retriever."""
+    search_index = SpaceIndex.from_env()
+    retriever = HybridRetriever.from_env(search_index) if search_index is not None else None
+    return {"page_cache": PageCache.from_env(), "search_index": search_index, "retriever": retriever}
+
+
+def preview(text, max_chars):
+    """Cuts text to max_chars (0 for no limit), marking the cut with '...'."""
+    text = str(text)
+    return text[:max_chars] + "..." if max_chars and len(text) > max_chars else text
+
+
+def format_ticket_context(ticket_id, context, max_chars=500):
+    """Formats one ticket's entry from ConfluenceConnector.get_ticket_contexts()."""
+    ticket = context.get("ticket")
+    if not ticket:
+        return f"Failed to fetch ticket details for {ticket_id} from Confluence."
+
+    output = []
+    output.append(f"Ticket Summary (Page Title): {ticket['summary']}")
+    output.append(f"Searching Confluence for: {ticket_id}")
+
+    # Related pages contain the ticket ID (strict check), or were ranked as related to it
+    # by the hybrid retriever over the local index
+    docs = context.get("docs", [])
+
+    output.append(f"Found {len(docs)} relevant pages matching {ticket_id}.")
+    for doc in docs:
+        output.append(f" - {doc.metadata['title']} ({doc.metadata['source']})")
+
+    # Alternative: Show Extracted Output
+    output.append("\n=== Extracted Content ===\n")
+    for i, doc in enumerate(docs):
+        output.append(f"--- Document {i+1}: {doc.metadata['title']} ---")
+        # Limit content length for readability in output
+        output.append(preview(doc.page_content, max_chars))
+        output.append("\n")
+    output.append("=========================")
+
+    return "\n".join(output)
@@ -1,9 +1,51 @@
 import os
-from atlassian import Confluence
-from langchain_core.documents import Document
+
+from src.connectors.documents import PageDocument, page_metadata
+from src.connectors.fetch_pool import (
+    DEFAULT_MAX_WORKERS,
+    call_with_backoff,
+    fetch_ordered,
+    tenant_gate,
+)
+from src.connectors.multi_match import MultiPatternMatcher
+from src.connectors.storage_text import storage_to_text
+from src.connectors.text_store import text_store
+from src.connectors.sessions import DEFAULT_POOL_MAXSIZE, mount_connection_pool
+from src.telemetry import add, instrument_session, span
+
+# Page ids per bulk body request when bodies were not expanded inline
+BODY_BATCH_SIZE = 25
+
+# Identifiers OR'd into one contributor CQL query
+CQL_OR_GROUP_SIZE = 20
+
+
+def _storage_body(content):
+    """Returns the storage-format body of a Confluence content dict, or None if it was not expanded."""
+    return (content.get('body') or {}).get('storage', {}).get('value')
+
+
+def _version_number(content):
+    """Returns the version.number of a Confluence content dict, or None if it was not expanded."""
+    return (content.get('version') or {}).get('number')
+
 
 class ConfluenceConnector:
-    def __init__(self, url, username, api_token):
+    def __init__(self, url, username, api_token, max_workers=None, tenant_concurrency=None,
+                 pool_connections=None, pool_maxsize=None, page_cache=None, search_index=None,
+                 retriever=None):
+        self.site = url.rstrip("/")
+        self.page_cache = page_cache
+        # Only consult a local index that was synced from this site
+        if search_index is not None and search_index.site not in (None, self.site):
+            search_index = None
+        self.search_index = search_index
+        # Optional HybridRetriever over the search index, used to rank a ticket's related pages
+        self.retriever = retriever if search_index is not None else None
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self._tenant = tenant_gate(url, tenant_concurrency)
+        # atlassian (and requests) are only imported once a connector is actually needed
+        from atlassian import Confluence
         self.confluence = Confluence(
             url=url,
             username=username,
@@ -17,81 +59,446 @@ class ConfluenceConnector:
         encoded_auth = base64.b64encode(auth_str.encode()).decode()
         self.confluence.session.headers.update({"Authorization": f"Basic {encoded_auth}"})
 
+        # Keep-alive pool with room for every fetch thread sharing this session
+        mount_connection_pool(
+            self.confluence.session,
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize or max(self.max_workers, DEFAULT_POOL_MAXSIZE),
+        )
+        instrument_session(self.confluence.session, "confluence")
+
+    def close(self):
+        """Closes the underlying HTTP session and its pooled connections."""
+        self.confluence.session.close()
+
+    def _search_with_bodies(self, cql, limit):
+        """
+        Runs a CQL search with the page bodies expanded inline (or served from the
+        page cache), so a search costs a single round trip instead of one extra
+        get_page_by_id call per hit.
+        Returns the 'content' entries of the search results, in result order.
+        """
+        results = self._call(self.confluence.cql, cql, limit=limit, expand=self._search_expand())
+        contents = [result['content'] for result in results.get('results', []) if 'content' in result]
+        return self._fill_bodies(contents)
+
+    def _to_document(self, content, store=None):
+        """
+        Builds a PageDocument with the extracted text of a content dict that carries its
+        body. With a store, the document holds a view of the text kept there.
+        """
+        text = storage_to_text(_storage_body(content), content['id'], _version_number(content))
+        return PageDocument(
+            page_content=store.put(text)[0] if store is not None else text,
+            metadata=page_metadata(content['id'], content['title'], content['_links']['webui'])
+        )
+
+    def _search_expand(self):
+        # With a page cache, only version metadata is requested up front and bodies
+        # are downloaded just for pages that are not cached at their current version.
+        return 'content.version' if self.page_cache else 'content.body.storage,content.version'
+
+    def _fill_bodies(self, contents):
+        """Makes sure every content dict carries its storage body. Returns contents."""
+        cache_hits = 0
+        if self.page_cache:
+            for content in contents:
+                version = _version_number(content)
+                body = self.page_cache.get(self.site, content['id'], version) if version is not None else None
+                if body is not None:
+                    content['body'] = {'storage': {'value': body}}
+                    cache_hits += 1
+            add("page_cache_hits", cache_hits)
+        add("pages_fetched", len(contents) - cache_hits)
+
+        # Some results (e.g. restricted or very large pages) can come back without
+        # a body. Fetch only those, in bulk content searches.
+        missing = [content['id'] for content in contents if _storage_body(content) is None]
+        if missing:
+            bodies = self.get_bodies(missing)
+            for content in contents:
+                if content['id'] in bodies:
+                    content['body'] = {'storage': {'value': bodies[content['id']]}}
+                    version = _version_number(content)
+                    if self.page_cache and version is not None:
+                        self.page_cache.put(self.site, content['id'], version, bodies[content['id']])
+        return contents
+
+    def get_bodies(self, page_ids):
+        """
+        Fetches the storage-format bodies of the given pages.
+        Returns a dict mapping page id to body.
+        """
+        batches = [page_ids[i:i + BODY_BATCH_SIZE] for i in range(0, len(page_ids), BODY_BATCH_SIZE)]
+        bodies = {}
+        for batch_bodies in fetch_ordered(self._get_body_batch, batches, self.max_workers):
+            bodies.update(batch_bodies)
+
+        # Last resort for anything the bulk requests did not return
+        missing = [page_id for page_id in page_ids if page_id not in bodies]
+        for page_id, body in zip(missing, fetch_ordered(self._get_body, missing, self.max_workers)):
+            bodies[page_id] = body
+        return bodies
+
+    def get_pages(self, page_ids):
+        """
+        Fetches pages with their storage body, version and space in bulk content searches.
+        Returns a dict mapping page id to content dict; pages that no longer exist (or are
+        not visible to the user) are missing from it.
+        """
+        page_ids = [str(pid) for pid in dict.fromkeys(page_ids)]
+        batches = [page_ids[i:i + BODY_BATCH_SIZE] for i in range(0, len(page_ids), BODY_BATCH_SIZE)]
+
+        def fetch(batch):
+            response = self._call(
+                self.confluence.get,
+                'rest/api/content/search',
+                params={
+                    'cql': f'id IN ({", ".join(batch)})',
+                    'expand': 'body.storage,version,space',
+                    'limit': len(batch),
+                },
+            ) or {}
+            return response.get('results', [])
+
+        pages = {}
+        for contents in fetch_ordered(fetch, batches, self.max_workers):
+            for content in contents:
+                pages[str(content['id'])] = content
+        return pages
+
+    def _get_body_batch(self, page_ids):
+        """Fetches the bodies of up to BODY_BATCH_SIZE pages in one content search."""
+        ids_str = ", ".join(str(pid) for pid in page_ids)
+        response = self._call(
+            self.confluence.get,
+            'rest/api/content/search',
+            params={'cql': f'id IN ({ids_str})', 'expand': 'body.storage', 'limit': len(page_ids)}
+        ) or {}
+        bodies = {}
+        for content in response.get('results', []):
+            body = _storage_body(content)
+            if body is not None:
+                bodies[content['id']] = body
+        return bodies
+
+    def _get_body(self, page_id):
+        """Fetches the body of a single page."""
+        page_content = self._call(self.confluence.get_page_by_id, page_id, expand='body.storage')
+        return _storage_body(page_content) or ''
+
+    def iter_search_results(self, cql, expand=None, page_size=50):
+        """
+        Yields the raw results of a CQL search one by one, following the
+        _links.next cursor until every page of results has been read.
+        """
+        for results in self._iter_result_batches(cql, expand, page_size):
+            for result in results:
+                yield result
+
+    def _iter_result_batches(self, cql, expand=None, page_size=50):
+        """Yields a CQL search's results one response page at a time, following _links.next."""
+        response = self._call(self.confluence.cql, cql, limit=page_size, expand=expand)
+        while True:
+            results = response.get('results', [])
+            if results:
+                yield results
+            next_link = (response.get('_links') or {}).get('next')
+            if not next_link or not results:
+                return
+            response = self._call(self.confluence.get, next_link.lstrip('/'))
+
+    def _call(self, func, *args, **kwargs):
+        """Runs a Confluence API call through the tenant's rate limiter and circuit breaker, with retries."""
+        return call_with_backoff(func, *args, gate=self._tenant, **kwargs)
+
     def search_pages(self, query, limit=5, exclude_ids=None):
         """
         Searches for pages in Confluence using CQL (Confluence Query Language).
-        Returns a list of LangChain Documents.
+        Returns a list of PageDocuments. Request failures are raised (after
+        retries) rather than reported as an empty result.
         """
-        try:
-            # Simple search for now. We can enhance this with CQL.
-            # cql = f'text ~ "{query}"'
-            # results = self.confluence.cql(cql, limit=limit)
-            
-            # Using the simple search API which might be easier for keywords
-            # But CQL is more powerful. Let's stick to CQL.
-            cql = f'siteSearch ~ "{query}" AND type = "page"'
-            
-            if exclude_ids:
-                ids_str = ", ".join([str(pid) for pid in exclude_ids])
-                cql += f' AND id NOT IN ({ids_str})'
-                
-            results = self.confluence.cql(cql, limit=limit)
-            
-            documents = []
-            for result in results.get('results', []):
-                page_id = result['content']['id']
-                title = result['content']['title']
-                # Fetch full content
-                page_content = self.confluence.get_page_by_id(page_id, expand='body.storage')
-                body = page_content.get('body', {}).get('storage', {}).get('value', '')
-                
-                # Simple HTML cleanup could go here, or we leave it for the RAG pipeline
-                
-                doc = Document(
-                    page_content=body,
-                    metadata={
-                        "title": title,
-                        "source": result['content']['_links']['webui'],
-                        "page_id": page_id
-                    }
-                )
-                documents.append(doc)
-                
-            return documents
+        if self.search_index:
+            hits = self.search_index.search(query, limit=limit, exclude_ids=exclude_ids)
+            if hits:
+                return [
+                    PageDocument(
+                        page_content=hit['text'],
+                        metadata=page_metadata(hit['page_id'], hit['title'], hit['source'])
+                    )
+                    for hit in hits
+                ]
 
-        except Exception as e:
-            print(f"Error searching Confluence: {e}")
-            return []
+        # Simple search for now. We can enhance this with CQL.
+        # cql = f'text ~ "{query}"'
+        # results = self.confluence.cql(cql, limit=limit)
+        
+        # Using the simple search API which might be easier for keywords
+        # But CQL is more powerful. Let's stick to CQL.
+        cql = f'siteSearch ~ "{query}" AND type = "page"'
+        
+        if exclude_ids:
+            ids_str = ", ".join([str(pid) for pid in exclude_ids])
+            cql += f' AND id NOT IN ({ids_str})'
+            
+        return [self._to_document(content) for content in self._search_with_bodies(cql, limit)]
 
     def get_ticket_page(self, ticket_id):
         """
         Searches for a page containing the ticket_id and returns its details.
         Assumes the page Title is the Summary and Body is the Description.
+        Returns None when no page mentions the ticket; request failures are raised.
         """
-        try:
-            # Search for the page containing the ticket ID
-            cql = f'text ~ "{ticket_id}" AND type = "page"'
-            results = self.confluence.cql(cql, limit=1)
+        if self.search_index:
+            page = self.search_index.find_ticket(ticket_id)
+            if page:
+                return {
+                    "key": ticket_id,
+                    "summary": page['title'],
+                    "description": page['text'],
+                    "page_id": page['page_id']
+                }
+
+        # Search for the page containing the ticket ID
+        cql = f'text ~ "{ticket_id}" AND type = "page"'
+        pages = self._search_with_bodies(cql, 1)
+        
+        if not pages:
+            print(f"No page found for ticket ID: {ticket_id}")
+            return None
             
-            if not results.get('results'):
+        page = pages[0]
+        page_id = page['id']
+        title = page['title']
+        body = storage_to_text(_storage_body(page), page_id, _version_number(page))
+        
+        return {
+            "key": ticket_id,
+            "summary": title,
+            "description": body,
+            "page_id": page_id
+        }
+
+    def get_page(self, page_id):
+        """
+        Returns a PageDocument for one page by id, from the local index when it has the
+        page and otherwise from Confluence (through the page cache). Request failures,
+        including unknown page ids, are raised.
+        """
+        if self.search_index:
+            page = self.search_index.get_page(page_id)
+            if page:
+                return PageDocument(
+                    page_content=page['text'],
+                    metadata=page_metadata(page['page_id'], page['title'], page['source'])
+                )
+        expand = self._search_expand().replace('content.', '')
+        content = self._call(self.confluence.get_page_by_id, page_id, expand=expand)
+        return self._to_document(self._fill_bodies([content])[0])
+
+    def get_ticket_contexts(self, ticket_ids, limit=5):
+        """
+        Looks up several tickets at once. One CQL query per ticket, for pages containing
+        the exact ticket ID, runs concurrently with the others: its best hit is the ticket
+        page and its hits whose text contains the ID are the related pages.
+        Bodies are fetched once for the union of all hits, so pages shared between
+        tickets are downloaded a single time. Tickets found in the local index are
+        answered from it, with related pages ranked by the retriever when one is set.
+
+        Returns a dict mapping each ticket ID to {"ticket": ..., "docs": [...]}, where
+        ticket has the same shape as get_ticket_page() (None if no page was found).
+        """
+        ticket_ids = [t for t in dict.fromkeys(t.strip() for t in ticket_ids) if t]
+        contexts = {ticket_id: {"ticket": None, "docs": []} for ticket_id in ticket_ids}
+
+        live_ids = []
+        for ticket_id in ticket_ids:
+            page = self.search_index.find_ticket(ticket_id) if self.search_index else None
+            if page is None:
+                live_ids.append(ticket_id)
+                continue
+            contexts[ticket_id]["ticket"] = {
+                "key": ticket_id,
+                "summary": page['title'],
+                "description": page['text'],
+                "page_id": page['page_id']
+            }
+            if self.retriever is not None:
+                # Fused ID, keyword and vector rankings also find pages that discuss the
+                # ticket without quoting its ID
+                hits = self.retriever.ticket_pages(ticket_id, page['title'], k=limit)
+            else:
+                hits = [hit for hit in self.search_index.search(ticket_id, limit=limit) if ticket_id in hit['text']]
+            contexts[ticket_id]["docs"] = [
+                PageDocument(
+                    page_content=hit['text'],
+                    metadata=page_metadata(hit['page_id'], hit['title'], hit['source'])
+                )
+                for hit in hits
+            ]
+        if not live_ids:
+            return contexts
+
+        def search(ticket_id):
+            # The quoted phrase keeps the strict ticket-ID filter in CQL, so pages
+            # that merely resemble the ID are never downloaded
+            cql = f'text ~ "\\"{ticket_id}\\"" AND type = "page"'
+            results = self._call(self.confluence.cql, cql, limit=limit, expand=self._search_expand())
+            return [result['content'] for result in results.get('results', []) if 'content' in result]
+
+        hits = fetch_ordered(search, live_ids, self.max_workers)
+
+        unique = {}
+        for contents in hits:
+            for content in contents:
+                unique.setdefault(content['id'], content)
+        self._fill_bodies(list(unique.values()))
+
+        for ticket_id, contents in zip(live_ids, hits):
+            docs = [self._to_document(unique[content['id']]) for content in contents]
+            if not docs:
                 print(f"No page found for ticket ID: {ticket_id}")
-                return None
-                
-            page = results['results'][0]
-            page_id = page['content']['id']
-            title = page['content']['title']
-            
-            # Fetch full content
-            page_content = self.confluence.get_page_by_id(page_id, expand='body.storage')
-            body = page_content.get('body', {}).get('storage', {}).get('value', '')
-            
-            return {
+                continue
+            contexts[ticket_id]["ticket"] = {
                 "key": ticket_id,
-                "summary": title,
-                "description": body,
-                "page_id": page_id
+                "summary": docs[0].metadata['title'],
+                "description": docs[0].page_content,
+                "page_id": docs[0].metadata['page_id']
             }
-            
-        except Exception as e:
-            print(f"Error fetching ticket page for {ticket_id}: {e}")
-            return None
+            contexts[ticket_id]["docs"] = [doc for doc in docs if ticket_id in doc.page_content]
+        return contexts
+
+    def search_employee_contributor(self, identifier: str, limit: int = 20, context_chars: int = 120):
+        """
+        Search Confluence pages for occurrences of an employee name or email (identifier).
+
+        Returns a list of dicts with: page_id, title, source, matches (snippets around each occurrence).
+        """
+        return self.search_contributors([identifier], limit=limit, context_chars=context_chars).get(identifier.strip(), [])
+
+    def search_contributors(self, identifiers, limit=200, context_chars=120, spill=None):
+        """
+        Searches Confluence pages for several employee names or emails at once.
+        The identifiers are OR'd into as few paginated CQL queries as possible and
+        each fetched page is scanned once for all of them, so the cost scales with
+        the number of pages read rather than pages times people.
+        limit caps the total number of pages scanned.
+
+        Returns a dict mapping each identifier to a list of dicts with: page_id, title,
+        source, matches (snippets around each occurrence, as TextViews). With spill (default:
+        HRABBIT_SPILL_TEXT) the matched pages' text is kept in a memory-mapped file.
+        """
+        identifiers = [i for i in dict.fromkeys(i.strip() for i in identifiers) if i]
+        results = {identifier: [] for identifier in identifiers}
+
+        if self.search_index:
+            for identifier in identifiers:
+                results[identifier] = self.search_index.find_contributor(
+                    identifier, limit=limit, context_chars=context_chars
+                )
+            # Only people the local index knows nothing about go to live CQL
+            identifiers = [identifier for identifier in identifiers if not results[identifier]]
+            if not identifiers:
+                return results
+
+        for identifier, match in self.iter_contributor_matches(
+            identifiers, max_pages=limit, context_chars=context_chars, spill=spill
+        ):
+            results[identifier].append(match)
+        return results
+
+    def iter_pages(self, query, exclude_ids=None, page_size=25, max_pages=None, spill=False):
+        """
+        Yields a PageDocument per page matching the query, following the CQL result cursor.
+        Bodies are fetched one result page at a time and only when the caller asks for
+        more, so stopping early (or consuming slowly) never downloads pages ahead of need.
+        With spill, the documents' text lives in a memory-mapped file until it is read.
+        """
+        cql = f'siteSearch ~ "{query}" AND type = "page"'
+        if exclude_ids:
+            ids_str = ", ".join([str(pid) for pid in exclude_ids])
+            cql += f' AND id NOT IN ({ids_str})'
+
+        store = text_store(spill) if spill else None
+        for content in self._iter_contents(cql, page_size, max_pages):
+            yield self._to_document(content, store)
+
+    def iter_contributor_matches(self, identifiers, page_size=50, max_pages=None, context_chars=120,
+                                 spill=None):
+        """
+        Yields (identifier, match) pairs as pages mentioning any of the identifiers are
+        scanned, where match is a dict with: page_id, title, source, matches (snippets).
+        Pages are read lazily through the CQL cursor, so memory stays flat however many
+        pages are scanned and the caller can stop at any point.
+        Snippets are TextViews into the page text, which is kept once per matched page
+        (in a memory-mapped file with spill, default: HRABBIT_SPILL_TEXT).
+        """
+        identifiers = [i for i in dict.fromkeys(i.strip() for i in identifiers) if i]
+        matcher = MultiPatternMatcher(identifiers)
+        store = text_store(spill)
+        seen = set()
+        for start in range(0, len(identifiers), CQL_OR_GROUP_SIZE):
+            group = identifiers[start:start + CQL_OR_GROUP_SIZE]
+            clauses = " OR ".join(f'siteSearch ~ "{identifier}"' for identifier in group)
+            cql = f'({clauses}) AND type = "page"'
+            remaining = None if max_pages is None else max_pages - len(seen)
+            if remaining is not None and remaining <= 0:
+                return
+            for content in self._iter_contents(cql, page_size, remaining, seen):
+                for identifier, match in self._scan_contributors(content, matcher, identifiers, context_chars, store):
+                    yield identifier, match
+
+    def _iter_contents(self, cql, page_size, max_pages=None, seen=None):
+        """
+        Yields the content dicts (with bodies) of a CQL search, filling bodies one
+        response page at a time. Pages already in seen are skipped; seen is updated.
+        """
+        seen = set() if seen is None else seen
+        count = 0
+        if max_pages is not None:
+            page_size = min(page_size, max_pages)
+        for batch in self._iter_result_batches(cql, self._search_expand(), page_size):
+            contents = []
+            for result in batch:
+                content = result.get('content')
+                if content and content['id'] not in seen:
+                    seen.add(content['id'])
+                    contents.append(content)
+                    if max_pages is not None and count + len(contents) >= max_pages:
+                        break
+            for content in self._fill_bodies(contents):
+                yield content
+                # The caller has extracted what it needs; don't hold on to the raw HTML
+                content.pop('body', None)
+            count += len(contents)
+            if max_pages is not None and count >= max_pages:
+                return
+
+    def _scan_contributors(self, content, matcher, identifiers, context_chars, store):
+        """
+        Scans one page for all identifiers. Returns a list of (identifier, match) pairs
+        whose snippets are views into the page text held by store.
+        """
+        text = storage_to_text(_storage_body(content), content['id'], _version_number(content))
+        windows = {}
+        next_start = {}
+        with span("contributors.scan", page_id=content['id'], chars=len(text)):
+            # The lowercased copy only lives for the scan; snippets are cut from text
+            for pos, index in matcher.finditer(text.lower()):
+                if pos < next_start.get(index, 0):
+                    continue
+                identifier = identifiers[index]
+                s = max(0, pos - context_chars)
+                e = min(len(text), pos + len(identifier) + context_chars)
+                windows.setdefault(index, []).append((s, e))
+                next_start[index] = pos + len(identifier)
+        if not windows:
+            return []
+
+        _, views = store.put(text, [window for index in windows for window in windows[index]])
+        metadata = page_metadata(content['id'], content['title'], content['_links']['webui'])
+        pairs = []
+        for index, found in windows.items():
+            pairs.append((identifiers[index], {**metadata, "matches": views[:len(found)]}))
+            views = views[len(found):]
+        return pairs
@@ -0,0 +1,45 @@
+from sys import intern
+
+
+def page_metadata(page_id, title, source):
+    """Metadata of a page with its strings interned, so repeated hits on a page share them."""
+    return {"title": intern(title), "source": intern(source), "page_id": intern(str(page_id))}
+
+
+class PageDocument:
+    """
+    Lightweight stand-in for langchain_core.documents.Document with the same
+    page_content/metadata attributes, returned by the connectors so that tool calls
+    which never reach an LLM don't have to import LangChain.
+    Everything in src.rag accepts either type; use to_langchain() where a real
+    Document is required.
+    page_content may be given as a TextView (e.g. into a SpillStore); the text is then
+    only materialized when read.
+    """
+    __slots__ = ("_text", "metadata")
+
+    def __init__(self, page_content="", metadata=None):
+        self._text = page_content
+        self.metadata = metadata if metadata is not None else {}
+
+    @property
+    def page_content(self):
+        return str(self._text)
+
+    @page_content.setter
+    def page_content(self, value):
+        self._text = value
+
+    def __repr__(self):
+        return f"PageDocument(page_content={self.page_content[:40]!r}, metadata={self.metadata!r})"
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PageDocument)
+            and self.page_content == other.page_content
+            and self.metadata == other.metadata
+        )
+
+    def to_langchain(self):
+        from langchain_core.documents import Document
+        return Document(page_content=self.page_content, metadata=dict(self.metadata))
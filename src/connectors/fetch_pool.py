@@ -0,0 +1,321 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from src.telemetry import add_metrics_source, bind_context, span
+
+# Default number of page fetches a connector runs in parallel.
+DEFAULT_MAX_WORKERS = int(os.getenv("CONFLUENCE_MAX_WORKERS", "8"))
+
+# Upper bound on in-flight requests per Atlassian tenant, shared by every
+# connector in the process that talks to the same site.
+DEFAULT_TENANT_CONCURRENCY = int(os.getenv("CONFLUENCE_TENANT_CONCURRENCY", "10"))
+
+# Requests per second per tenant (0 = unlimited). The limiter halves its rate on
+# throttling responses and climbs back to this ceiling as requests succeed.
+DEFAULT_RATE_LIMIT = float(os.getenv("ATLASSIAN_RATE_LIMIT", "20"))
+
+# Consecutive failed requests that open a tenant's circuit, and how long it stays
+# open before a trial request is let through.
+DEFAULT_BREAKER_THRESHOLD = int(os.getenv("ATLASSIAN_BREAKER_THRESHOLD", "5"))
+DEFAULT_BREAKER_RESET_SECONDS = float(os.getenv("ATLASSIAN_BREAKER_RESET", "30"))
+
+# Responses worth retrying, and the subset that means "slow down"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while a tenant's circuit breaker is open."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` acquisitions per second with bursts of
+    up to `burst`. A rate of 0 means unlimited.
+    throttle() halves the rate (down to min_rate) and can pause every caller until a
+    server's Retry-After has passed; recover() raises it back towards the initial rate.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif not self.rate:
+                    return
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        with self._lock:
+            if self.rate:
+                self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def recover(self):
+        with self._lock:
+            if self.rate and self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures so that callers fail fast instead of
+    piling more requests onto a struggling tenant. Once `reset_seconds` have passed,
+    one trial request per window is let through; a success closes the circuit again.
+    """
+
+    def __init__(self, threshold=None, reset_seconds=None):
+        self.threshold = threshold or DEFAULT_BREAKER_THRESHOLD
+        self.reset_seconds = DEFAULT_BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_seconds - now
+            if remaining > 0:
+                raise CircuitOpenError(
+                    f"Circuit open after {self._failures} consecutive failures; retry in {remaining:.0f}s"
+                )
+            # Half-open: this caller is the trial, everyone else waits another window
+            self._opened_at = now
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class EndpointMetrics:
+    """Per-endpoint call counts, errors, retries and latency, shared by all connectors."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status=None, error=False, retried=False):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {
+                    "calls": 0, "errors": 0, "retries": 0, "throttled": 0,
+                    "total_seconds": 0.0, "max_seconds": 0.0,
+                }
+            stats["calls"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if error:
+                stats["errors"] += 1
+            if retried:
+                stats["retries"] += 1
+            if status in THROTTLE_STATUS_CODES:
+                stats["throttled"] += 1
+
+    def snapshot(self):
+        """Returns {endpoint: {calls, errors, retries, throttled, avg_ms, max_ms}}."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "throttled": stats["throttled"],
+                    "avg_ms": round(1000 * stats["total_seconds"] / stats["calls"], 1),
+                    "max_ms": round(1000 * stats["max_seconds"], 1),
+                }
+                for endpoint, stats in self._stats.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+endpoint_metrics = EndpointMetrics()
+
+
+def _endpoint_metric_samples():
+    """Exports endpoint_metrics in Prometheus form (see src.telemetry)."""
+    for endpoint, stats in endpoint_metrics.snapshot().items():
+        labels = {"endpoint": endpoint}
+        yield "atlassian_requests_total", labels, stats["calls"]
+        yield "atlassian_request_errors_total", labels, stats["errors"]
+        yield "atlassian_request_retries_total", labels, stats["retries"]
+        yield "atlassian_request_throttled_total", labels, stats["throttled"]
+        yield "atlassian_request_max_ms", labels, stats["max_ms"]
+
+
+add_metrics_source(_endpoint_metric_samples)
+
+
+class TenantGate:
+    """The concurrency cap, rate limiter and circuit breaker shared by all requests to one tenant."""
+
+    def __init__(self, concurrency=None, rate=None):
+        self.semaphore = threading.BoundedSemaphore(concurrency or DEFAULT_TENANT_CONCURRENCY)
+        self.limiter = TokenBucket(DEFAULT_RATE_LIMIT if rate is None else rate)
+        self.breaker = CircuitBreaker()
+
+
+_tenant_gates = {}
+_tenant_lock = threading.Lock()
+
+
+def tenant_gate(url, concurrency=None, rate=None):
+    """
+    Returns the TenantGate for the Atlassian tenant at `url`, shared by every
+    Confluence and Jira connector in the process. Tenants are keyed by host, so a
+    Confluence base URL ending in /wiki shares the gate of the site's Jira. The first
+    caller for a tenant decides its limits.
+    """
+    # A URL without a scheme has no netloc; its first path segment is the host
+    parts = urlsplit(url if "//" in url else "//" + url)
+    key = parts.netloc.lower()
+    with _tenant_lock:
+        if key not in _tenant_gates:
+            _tenant_gates[key] = TenantGate(concurrency, rate)
+        return _tenant_gates[key]
+
+
+def _retry_after_seconds(response):
+    """
+    Parses the Retry-After header of a response (delta-seconds or HTTP date).
+    Returns None when the header is missing or unreadable.
+    """
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _endpoint_name(func, args):
+    """Names an API call for metrics: the REST path when one is given, else the method name."""
+    if args and isinstance(args[0], str) and "/" in args[0]:
+        return args[0].split("?", 1)[0]
+    return getattr(func, "__name__", "call")
+
+
+def _is_connection_error(error):
+    # Imported here so that loading this module doesn't pull in requests
+    from requests.exceptions import ConnectionError, Timeout
+    return isinstance(error, (ConnectionError, Timeout))
+
+
+def call_with_backoff(func, *args, gate=None, endpoint=None, max_retries=4, base_delay=1.0, max_delay=30.0,
+                      **kwargs):
+    """
+    Calls func(*args, **kwargs), retrying on 429 and transient 5xx responses and on
+    connection errors. Waits for the server's Retry-After when given, otherwise backs
+    off exponentially with full jitter.
+
+    With a TenantGate, the call first passes the tenant's circuit breaker (raising
+    CircuitOpenError when it is open); each attempt then passes the rate limiter and
+    holds a concurrency slot only while the request is in flight. 429s slow the limiter
+    down for every caller and never count against the breaker; other retryable errors
+    count as one breaker failure per call, once its retries are exhausted. Errors that
+    are not retryable, or still failing after max_retries, are raised. Every attempt is
+    recorded in endpoint_metrics.
+    """
+    endpoint = endpoint or _endpoint_name(func, args)
+    attempt = 0
+    while True:
+        if gate is not None:
+            if attempt == 0:
+                gate.breaker.before_call()
+            gate.limiter.acquire()
+        started = time.perf_counter()
+        try:
+            with span("atlassian.request", endpoint=endpoint, attempt=attempt):
+                if gate is None:
+                    result = func(*args, **kwargs)
+                else:
+                    with gate.semaphore:
+                        result = func(*args, **kwargs)
+        except Exception as e:
+            elapsed = time.perf_counter() - started
+            response = getattr(e, "response", None)
+            status = getattr(response, "status_code", None)
+            retryable = status in RETRY_STATUS_CODES or _is_connection_error(e)
+            will_retry = retryable and attempt < max_retries
+            endpoint_metrics.record(endpoint, elapsed, status=status, error=True, retried=will_retry)
+
+            delay = _retry_after_seconds(response)
+            if gate is not None and retryable:
+                if status in THROTTLE_STATUS_CODES:
+                    gate.limiter.throttle(delay)
+                # Throttling is handled by the limiter, and client errors such as 404 say
+                # nothing about the tenant's health; only a call that failed for good counts
+                if not will_retry and status != 429:
+                    gate.breaker.record_failure()
+            if not will_retry:
+                raise
+            if delay is None:
+                delay = random.uniform(0, base_delay * (2 ** attempt))
+            time.sleep(min(delay, max_delay))
+            attempt += 1
+            continue
+
+        endpoint_metrics.record(endpoint, time.perf_counter() - started)
+        if gate is not None:
+            gate.breaker.record_success()
+            gate.limiter.recover()
+        return result
+
+
+def fetch_ordered(func, items, max_workers=None):
+    """
+    Runs func over items on a bounded thread pool and returns the results
+    in the same order as items.
+    """
+    items = list(items)
+    max_workers = min(max_workers or DEFAULT_MAX_WORKERS, len(items))
+    if max_workers <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(bind_context(func), items))
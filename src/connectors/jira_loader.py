@@ -1,33 +1,195 @@
 import os
-from atlassian import Jira
+import re
+from datetime import datetime, timedelta, timezone
+
+from src.connectors.fetch_pool import (
+    DEFAULT_MAX_WORKERS,
+    call_with_backoff,
+    fetch_ordered,
+    tenant_gate,
+)
+from src.connectors.sessions import DEFAULT_POOL_MAXSIZE, mount_connection_pool
+from src.telemetry import instrument_session
+
+# Only the fields we actually use are requested from Jira
+DEFAULT_FIELDS = ["summary", "description", "status", "assignee", "reporter", "created", "updated"]
+
+# Issues per JQL search response, and issue keys per "key IN (...)" query
+JQL_PAGE_SIZE = 100
+KEYS_PER_QUERY = 100
+
+# JQL reads date literals in the API user's timezone (anywhere from UTC-12 to UTC+14),
+# so incremental queries are widened by this much and then filtered exactly on 'updated'
+DEFAULT_UPDATED_OVERLAP_MINUTES = int(os.getenv("HRABBIT_JIRA_OVERLAP_MINUTES", "1440"))
+
+# Issue keys are put into "key IN (...)" unquoted; anything else would fail the whole query
+ISSUE_KEY = re.compile(r"[A-Z][A-Z0-9_]+-\d+")
+
+
+def _user_name(user):
+    return (user or {}).get('displayName') or (user or {}).get('emailAddress') or ''
+
+
+def _parse_timestamp(value):
+    """Parses a Jira/ISO 8601 timestamp ('Z' or '+0000' offsets) into an aware datetime, UTC if it has no offset."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _jql_string(value):
+    """Quotes a value as a JQL string literal, escaping backslashes and double quotes."""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def _jql_datetime(value):
+    """Formats an aware datetime as a JQL date literal (UTC, minute resolution)."""
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M')
+
 
 class JiraConnector:
-    def __init__(self, url, username, api_token):
+    def __init__(self, url, username, api_token, max_workers=None, tenant_concurrency=None):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self._tenant = tenant_gate(url, tenant_concurrency)
+        # atlassian (and requests) are only imported once a connector is actually needed
+        from atlassian import Jira
         self.jira = Jira(
             url=url,
             username=username,
             password=api_token,
             cloud=True
         )
+        mount_connection_pool(self.jira.session, pool_maxsize=max(self.max_workers, DEFAULT_POOL_MAXSIZE))
+        instrument_session(self.jira.session, "jira")
+
+    def close(self):
+        """Closes the underlying HTTP session and its pooled connections."""
+        self.jira.session.close()
 
     def get_ticket_details(self, issue_key):
         """
         Fetches summary and description for a given Jira issue key.
+        Request failures (including unknown keys) are raised after retries.
+        """
+        issue = self._call(self.jira.issue, issue_key, fields="summary,description")
+        fields = issue.get('fields', {})
+        summary = fields.get('summary', '')
+        description = fields.get('description', '')
+        # Handle cases where description might be None
+        if description is None:
+            description = ""
+
+        return {
+            "key": issue_key,
+            "summary": summary,
+            "description": description
+        }
+
+    def iter_issues(self, jql, fields=None, page_size=JQL_PAGE_SIZE):
+        """
+        Yields the issues matching a JQL query as flat dicts (see issue_record),
+        following the search's nextPageToken until the last page.
+        Only the given fields (default: DEFAULT_FIELDS) are fetched.
         """
-        try:
-            issue = self.jira.issue(issue_key)
-            fields = issue.get('fields', {})
-            summary = fields.get('summary', '')
-            description = fields.get('description', '')
-            # Handle cases where description might be None
-            if description is None:
-                description = ""
-            
-            return {
-                "key": issue_key,
-                "summary": summary,
-                "description": description
-            }
-        except Exception as e:
-            print(f"Error fetching Jira issue {issue_key}: {e}")
-            return None
+        fields = fields or DEFAULT_FIELDS
+        params = {'jql': jql, 'fields': ",".join(fields), 'maxResults': page_size}
+        while True:
+            response = self._call(self.jira.get, 'rest/api/2/search/jql', params=params) or {}
+            for issue in response.get('issues', []):
+                yield issue_record(issue)
+            next_token = response.get('nextPageToken')
+            if response.get('isLast', True) or not next_token:
+                return
+            params = dict(params, nextPageToken=next_token)
+
+    def search_issues(self, jql, fields=None, max_issues=None):
+        """
+        Returns the issues matching a JQL query, up to max_issues.
+        """
+        issues = []
+        for issue in self.iter_issues(jql, fields=fields):
+            issues.append(issue)
+            if max_issues is not None and len(issues) >= max_issues:
+                break
+        return issues
+
+    def get_tickets(self, issue_keys, fields=None):
+        """
+        Fetches many issues in "key IN (...)" batches run concurrently.
+        Returns the issues found, in the order of issue_keys; keys that are not valid
+        issue keys (see ISSUE_KEY) are skipped.
+        """
+        keys = []
+        for key in dict.fromkeys(issue_keys):
+            if ISSUE_KEY.fullmatch(key):
+                keys.append(key)
+            else:
+                print(f"Skipping invalid Jira issue key: {key!r}")
+        batches = [keys[i:i + KEYS_PER_QUERY] for i in range(0, len(keys), KEYS_PER_QUERY)]
+
+        def fetch(batch):
+            return self.search_issues(f"key IN ({', '.join(batch)})", fields=fields)
+
+        by_key = {}
+        for issues in fetch_ordered(fetch, batches, self.max_workers):
+            for issue in issues:
+                by_key[issue['key']] = issue
+        return [by_key[key] for key in keys if key in by_key]
+
+    def get_employee_history(self, employee, updated_since=None, fields=None,
+                             overlap_minutes=DEFAULT_UPDATED_OVERLAP_MINUTES):
+        """
+        Fetches every issue an employee is assignee or reporter of, oldest update first.
+        employee is an account id, email or display name as accepted by JQL.
+        With updated_since (an ISO 8601 timestamp, e.g. the 'updated' of the newest issue
+        from a previous run) only issues updated since then are returned. The JQL window
+        starts overlap_minutes earlier, since Jira reads it in the user's timezone, and
+        the results are then filtered on their exact 'updated' time.
+        """
+        jql = f'(assignee = {_jql_string(employee)} OR reporter = {_jql_string(employee)})'
+        since = _parse_timestamp(updated_since) if updated_since else None
+        if since is not None:
+            jql += f' AND updated >= "{_jql_datetime(since - timedelta(minutes=overlap_minutes))}"'
+        jql += ' ORDER BY updated ASC'
+        issues = self.search_issues(jql, fields=fields)
+        if since is None:
+            return issues
+
+        # Drop what the widened window let in, and any issue returned twice
+        unique = {}
+        for issue in issues:
+            if issue['updated'] is None or _parse_timestamp(issue['updated']) >= since:
+                unique.setdefault(issue['key'], issue)
+        return list(unique.values())
+
+    def get_employee_histories(self, employees, updated_since=None, fields=None):
+        """
+        Runs get_employee_history for several employees concurrently.
+        Returns a dict mapping each employee to their issues.
+        """
+        employees = list(dict.fromkeys(employees))
+        histories = fetch_ordered(
+            lambda employee: self.get_employee_history(employee, updated_since=updated_since, fields=fields),
+            employees,
+            self.max_workers,
+        )
+        return dict(zip(employees, histories))
+
+    def _call(self, func, *args, **kwargs):
+        """Runs a Jira API call through the tenant's rate limiter and circuit breaker, with retries."""
+        return call_with_backoff(func, *args, gate=self._tenant, **kwargs)
+
+
+def issue_record(issue):
+    """Flattens a Jira search result into the fields the pipeline uses."""
+    fields = issue.get('fields', {})
+    status = fields.get('status') or {}
+    return {
+        "key": issue.get('key'),
+        "summary": fields.get('summary', ''),
+        "description": fields.get('description') or "",
+        "status": status.get('name', ''),
+        "assignee": _user_name(fields.get('assignee')),
+        "reporter": _user_name(fields.get('reporter')),
+        "created": fields.get('created'),
+        "updated": fields.get('updated'),
+    }
@@ -0,0 +1,54 @@
+from collections import deque
+
+
+class MultiPatternMatcher:
+    """
+    Aho-Corasick automaton that finds every occurrence of many patterns in a single
+    pass over a text, so scanning a page costs the same for 1 or 100 identifiers.
+    Matching is case-insensitive; pass lowercased text to finditer.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = [pattern.lower() for pattern in patterns]
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for index, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                next_node = self._goto[node].get(ch)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][ch] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = next_node
+            self._out[node].append(index)
+
+        # Breadth-first pass to set failure links; depth-1 nodes fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text):
+        """Yields (start, pattern_index) for every match in text, in order of match end."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index in out[node]:
+                yield i - len(patterns[index]) + 1, index
@@ -0,0 +1,178 @@
+import os
+import time
+import sqlite3
+import threading
+
+DEFAULT_CACHE_DIR = os.getenv("HRABBIT_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "hrabbit"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("HRABBIT_PAGE_CACHE_MAX_ENTRIES", "5000"))
+DEFAULT_MAX_BYTES = int(os.getenv("HRABBIT_PAGE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = float(os.getenv("HRABBIT_PAGE_CACHE_TTL", str(7 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    site TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (site, page_id)
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+CREATE INDEX IF NOT EXISTS pages_fetched_at ON pages (fetched_at);
+"""
+
+# Cache hits pending an accessed_at update before they are written in one transaction
+ACCESS_FLUSH_SIZE = 256
+
+
+class PageCache:
+    """
+    Single-file SQLite cache of Confluence page bodies keyed by (site, page id) and
+    validated against the page's version.number. Entries older than the TTL are treated
+    as misses, and the least recently used entries are evicted once the cache grows
+    past max_entries or max_bytes.
+
+    Hits only record their access time in memory; it is written with the next put (or
+    every ACCESS_FLUSH_SIZE hits, and on close), so reads never wait on a commit. Entry
+    and byte totals are counted at open and kept up to date by this instance's writes.
+    """
+
+    def __init__(self, path=None, max_entries=None, max_bytes=None, ttl_seconds=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "pages.sqlite")
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.max_bytes = max_bytes or DEFAULT_MAX_BYTES
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._accessed = {}
+        self._entries, self._bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages"
+        ).fetchone()
+
+    @classmethod
+    def from_env(cls):
+        """Returns the default cache, or None when disabled with HRABBIT_PAGE_CACHE=0."""
+        if os.getenv("HRABBIT_PAGE_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        try:
+            return cls()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error opening page cache, continuing without it: {e}")
+            return None
+
+    def get(self, site, page_id, version):
+        """
+        Returns the cached body of a page if it is cached at exactly this version and
+        has not expired, otherwise None.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version, body, fetched_at FROM pages WHERE site = ? AND page_id = ?",
+                (site, str(page_id)),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            cached_version, body, fetched_at = row
+            if cached_version != version or now - fetched_at > self.ttl_seconds:
+                self.stale += 1
+                self.misses += 1
+                return None
+            self._accessed[(site, str(page_id))] = now
+            if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+                self._flush_accessed()
+                self._db.commit()
+            self.hits += 1
+            return body
+
+    def put(self, site, page_id, version, body):
+        """Stores the body of a page at the given version and evicts old entries if needed."""
+        now = time.time()
+        size = len(body.encode("utf-8"))
+        with self._lock:
+            self._delete(site, str(page_id))
+            self._db.execute(
+                "INSERT INTO pages (site, page_id, version, body, size, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (site, str(page_id), version, body, size, now, now),
+            )
+            self._entries += 1
+            self._bytes += size
+            self._accessed.pop((site, str(page_id)), None)
+            self._flush_accessed()
+            self._evict()
+            self._db.commit()
+
+    def invalidate(self, site, page_id):
+        """Drops a page from the cache."""
+        with self._lock:
+            self._delete(site, str(page_id))
+            self._db.commit()
+
+    def stats(self):
+        """Returns hit/miss counters and the current size of the cache."""
+        with self._lock:
+            entries, size = self._entries, self._bytes
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._db.commit()
+            self._db.close()
+
+    def _flush_accessed(self):
+        """Writes the access times of pending hits. Caller holds the lock and commits."""
+        if self._accessed:
+            self._db.executemany(
+                "UPDATE pages SET accessed_at = ? WHERE site = ? AND page_id = ?",
+                [(accessed_at, site, page_id) for (site, page_id), accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _delete(self, site, page_id):
+        """Deletes an entry and takes it off the running totals. Caller holds the lock."""
+        row = self._db.execute("SELECT size FROM pages WHERE site = ? AND page_id = ?", (site, page_id)).fetchone()
+        if row is None:
+            return False
+        self._db.execute("DELETE FROM pages WHERE site = ? AND page_id = ?", (site, page_id))
+        self._entries -= 1
+        self._bytes -= row[0]
+        return True
+
+    def _evict(self):
+        """Removes expired entries, then least recently used ones until within bounds."""
+        expired = self._db.execute(
+            "SELECT site, page_id FROM pages WHERE fetched_at < ?", (time.time() - self.ttl_seconds,)
+        ).fetchall()
+        for site, page_id in expired:
+            self.evictions += self._delete(site, page_id)
+
+        if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT site, page_id FROM pages ORDER BY accessed_at")
+        for site, page_id in rows.fetchall():
+            if self._entries <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            self.evictions += self._delete(site, page_id)
@@ -0,0 +1,75 @@
+import os
+import hashlib
+import threading
+
+# Keep-alive pool sizes for connector HTTP sessions
+DEFAULT_POOL_CONNECTIONS = int(os.getenv("ATLASSIAN_POOL_CONNECTIONS", "4"))
+DEFAULT_POOL_MAXSIZE = int(os.getenv("ATLASSIAN_POOL_MAXSIZE", "16"))
+
+
+def mount_connection_pool(session, pool_connections=None, pool_maxsize=None):
+    """
+    Mounts an HTTPAdapter with the given keep-alive pool sizes on a requests session.
+    pool_maxsize should be at least the number of threads sharing the session,
+    otherwise connections are discarded instead of being reused.
+    """
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections or DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize or DEFAULT_POOL_MAXSIZE,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+class ConnectorRegistry:
+    """
+    Process-wide cache of connectors keyed by (url, username, token hash), so tool
+    invocations in the same process reuse one connector and its keep-alive connections.
+    When the credentials for a site and user change, the old connector is closed and dropped.
+
+    shared_kwargs is an optional callable returning more connector kwargs (e.g. the page
+    cache and search index). It is called once, when the first connector is created,
+    so that importing a module that defines a registry stays cheap.
+    """
+
+    def __init__(self, factory, shared_kwargs=None, **connector_kwargs):
+        self.factory = factory
+        self.connector_kwargs = connector_kwargs
+        self._shared_kwargs = shared_kwargs
+        self._connectors = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, username, api_token):
+        """Returns the connector for these credentials, creating it on first use."""
+        token_hash = hashlib.sha256(api_token.encode()).hexdigest()
+        key = (url.rstrip("/"), username, token_hash)
+        with self._lock:
+            connector = self._connectors.get(key)
+            if connector is not None:
+                return connector
+
+            # Credentials for this site/user were rotated: drop the stale connectors
+            for stale_key in [k for k in self._connectors if k[:2] == key[:2]]:
+                self._close(self._connectors.pop(stale_key))
+
+            if self._shared_kwargs is not None:
+                self.connector_kwargs = dict(self._shared_kwargs(), **self.connector_kwargs)
+                self._shared_kwargs = None
+            connector = self.factory(url, username, api_token, **self.connector_kwargs)
+            self._connectors[key] = connector
+            return connector
+
+    def clear(self):
+        """Closes and forgets every cached connector."""
+        with self._lock:
+            for connector in self._connectors.values():
+                self._close(connector)
+            self._connectors.clear()
+
+    @staticmethod
+    def _close(connector):
+        try:
+            connector.close()
+        except Exception as e:
+            print(f"Error closing connector: {e}")
@@ -0,0 +1,155 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+from src.telemetry import add, span
+
+TEXT_CACHE_SIZE = int(os.getenv("HRABBIT_TEXT_CACHE_SIZE", "1024"))
+
+# Elements that start a new line in the extracted text
+_BLOCK_TAGS = frozenset([
+    "p", "div", "br", "hr", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li",
+    "table", "tr", "pre", "blockquote", "section", "dl", "dt", "dd",
+    "ac:structured-macro", "ac:layout", "ac:layout-section", "ac:layout-cell",
+    "ac:task-list", "ac:task", "ac:rich-text-body", "ac:plain-text-body",
+])
+# Elements whose content is never part of the page text
+_SKIP_TAGS = frozenset(["script", "style", "ac:parameter", "ac:task-id", "ac:task-status", "ac:image"])
+_CELL_TAGS = frozenset(["td", "th"])
+
+_MARKUP = re.compile(r"</?(?:p|div|span|br|h[1-6]|ul|ol|li|table|tr|td|th|pre|code|strong|em|a|ac:[\w-]+|ri:[\w-]+)\b", re.I)
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0]+")
+_NEWLINES = re.compile(r"\n{2,}")
+_LINE_EDGES = re.compile(r" *\n *")
+
+
+class _StorageTextParser(HTMLParser):
+    """Collects the visible text of a Confluence storage-format document in one pass."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+        self._pre_depth = 0
+        self._row_has_cell = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if self._skip_depth:
+            return
+        if tag in _CELL_TAGS:
+            if self._row_has_cell:
+                self.parts.append(" | ")
+            self._row_has_cell = True
+        elif tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+            if tag == "tr":
+                self._row_has_cell = False
+            elif tag == "li":
+                self.parts.append("- ")
+        if tag in ("pre", "ac:plain-text-body"):
+            self._pre_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if not self._skip_depth and tag in ("br", "hr"):
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if self._skip_depth:
+            return
+        if tag in ("pre", "ac:plain-text-body"):
+            self._pre_depth = max(0, self._pre_depth - 1)
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if self._skip_depth or not data:
+            return
+        if self._pre_depth:
+            # Code blocks keep their line breaks and indentation; marked so that
+            # whitespace folding leaves them alone
+            self.parts.append(data.replace("\n", "\x00").replace(" ", "\x01"))
+        else:
+            self.parts.append(data)
+
+    def unknown_decl(self, data):
+        # Code and plain-text macro bodies arrive as <![CDATA[...]]>
+        if data.startswith("CDATA["):
+            self.handle_data(data[len("CDATA["):])
+
+    def handle_comment(self, data):
+        # Newer html.parser versions report CDATA sections as bogus comments
+        if data.startswith("[CDATA[") and data.endswith("]]"):
+            self.handle_data(data[len("[CDATA["):-2])
+
+    def text(self):
+        text = "".join(self.parts)
+        text = _SPACES.sub(" ", text)
+        text = _LINE_EDGES.sub("\n", text)
+        text = _NEWLINES.sub("\n", text)
+        return text.replace("\x00", "\n").replace("\x01", " ").strip()
+
+
+class _TextCache:
+    """Small thread-safe LRU of extracted text keyed by (page id, version)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._entries[key] = text
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+_text_cache = _TextCache(TEXT_CACHE_SIZE)
+
+
+def storage_to_text(body, page_id=None, version=None):
+    """
+    Converts a Confluence storage-format body to plain text.
+    Block elements become line breaks, table cells are joined with ' | ', list items get
+    a '- ' prefix, code/CDATA macro bodies are kept verbatim and macro parameters dropped.
+    When page_id and version are given, the result is cached for that page version.
+    """
+    if not body:
+        return ""
+    key = (str(page_id), version) if page_id is not None and version is not None else None
+    if key is not None:
+        text = _text_cache.get(key)
+        if text is not None:
+            add("text_cache_hits")
+            return text
+
+    with span("text.extract", chars=len(body)):
+        parser = _StorageTextParser()
+        parser.feed(body)
+        parser.close()
+        text = parser.text()
+
+    if key is not None:
+        _text_cache.put(key, text)
+    return text
+
+
+def looks_like_markup(text):
+    """True if text looks like HTML/storage format rather than already-extracted text."""
+    return bool(_MARKUP.search(text))
@@ -0,0 +1,160 @@
+import os
+import mmap
+import tempfile
+import threading
+
+# Spill extracted page text to a memory-mapped temporary file during large scans
+SPILL_TEXT = os.getenv("HRABBIT_SPILL_TEXT", "0").lower() in ("1", "true", "yes", "on")
+# Where spill files are created (default: the system temp directory)
+SPILL_DIR = os.getenv("HRABBIT_SPILL_DIR") or None
+
+
+class TextView:
+    """
+    An (offset, length) window into a page's text that is only turned into a string
+    when read. The source is either the page text itself (offset and length in
+    characters) or a SpillStore (offset and length in bytes of its file).
+    Behaves like the string for str(), formatting, len(), slicing and comparison.
+    """
+    __slots__ = ("_source", "offset", "length")
+
+    def __init__(self, source, offset, length):
+        self._source = source
+        self.offset = offset
+        self.length = length
+
+    def __str__(self):
+        if isinstance(self._source, str):
+            return self._source[self.offset:self.offset + self.length]
+        return self._source.read(self.offset, self.length)
+
+    def __format__(self, spec):
+        return format(str(self), spec)
+
+    def __len__(self):
+        return self.length if isinstance(self._source, str) else len(str(self))
+
+    def __getitem__(self, key):
+        return str(self)[key]
+
+    def __contains__(self, item):
+        return item in str(self)
+
+    def __eq__(self, other):
+        if isinstance(other, (str, TextView)):
+            return str(self) == str(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return f"TextView({str(self)[:40]!r}, offset={self.offset}, length={self.length})"
+
+
+def _strip_span(text, start, end):
+    """Narrows text[start:end] to its stripped bounds without copying it."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _byte_offsets(text, positions):
+    """
+    Maps character positions in text to byte positions in its UTF-8 encoding. Positions
+    are visited in order, so each stretch of text is encoded once however many spans there are.
+    """
+    offsets = {}
+    char_pos = byte_pos = 0
+    for pos in sorted(set(positions)):
+        byte_pos += len(text[char_pos:pos].encode("utf-8"))
+        char_pos = pos
+        offsets[pos] = byte_pos
+    return offsets
+
+
+class MemoryTextStore:
+    """Views straight into the extracted text, which stays in memory (shared with the text cache)."""
+
+    def put(self, text, spans=()):
+        """Returns a view of the whole text and one stripped view per (start, end) span."""
+        views = []
+        for start, end in spans:
+            start, end = _strip_span(text, start, end)
+            views.append(TextView(text, start, end - start))
+        return TextView(text, 0, len(text)), views
+
+    def close(self):
+        pass
+
+
+class SpillStore:
+    """
+    Append-only temporary file of UTF-8 page text, read back through mmap.
+    Only the views are kept in memory, so a scan's footprint no longer grows with the
+    text of every page it matched. The file is deleted when the store is closed or
+    the last view referencing it is garbage collected.
+    """
+
+    def __init__(self, directory=None):
+        self._file = tempfile.TemporaryFile(dir=directory or SPILL_DIR)
+        self._size = 0
+        self._map = None
+        self._mapped = 0
+        self._lock = threading.Lock()
+
+    def put(self, text, spans=()):
+        """Appends text to the file. Returns a view of it and one stripped view per (start, end) span."""
+        data = text.encode("utf-8")
+        with self._lock:
+            offset = self._size
+            self._file.seek(offset)
+            self._file.write(data)
+            self._size += len(data)
+
+        spans = [_strip_span(text, start, end) for start, end in spans]
+        if len(data) == len(text):
+            # ASCII: character and byte positions are the same
+            return TextView(self, offset, len(data)), [
+                TextView(self, offset + start, end - start) for start, end in spans
+            ]
+        # Character positions to byte positions within this page's encoding
+        byte_offsets = _byte_offsets(text, [pos for span in spans for pos in span])
+        views = [
+            TextView(self, offset + byte_offsets[start], byte_offsets[end] - byte_offsets[start])
+            for start, end in spans
+        ]
+        return TextView(self, offset, len(data)), views
+
+    def read(self, offset, length):
+        if not length:
+            return ""
+        with self._lock:
+            if offset + length > self._mapped:
+                # Text was appended since the file was last mapped
+                self._file.flush()
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._file.fileno(), self._size, access=mmap.ACCESS_READ)
+                self._mapped = self._size
+            return self._map[offset:offset + length].decode("utf-8")
+
+    @property
+    def size(self):
+        return self._size
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+
+
+def text_store(spill=None):
+    """Returns a SpillStore when spilling is requested (default: HRABBIT_SPILL_TEXT), else a MemoryTextStore."""
+    if SPILL_TEXT if spill is None else spill:
+        return SpillStore()
+    return MemoryTextStore()
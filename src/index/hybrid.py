@@ -0,0 +1,213 @@
+"""
+Hybrid page retrieval over the local index: the FTS5 (BM25) rankings of the SpaceIndex and
+the vector rankings of a PageVectorStore are fused with reciprocal rank fusion, then the
+fused candidates are optionally reranked by a cross-encoder running on CPU.
+"""
+import os
+import re
+import importlib.util
+import threading
+
+from src.connectors.page_cache import DEFAULT_CACHE_DIR
+from src.index.space_index import query_terms
+from src.telemetry import add, span
+
+# Rank offset of reciprocal rank fusion; higher values flatten the advantage of top ranks
+DEFAULT_RRF_K = int(os.getenv("HRABBIT_RRF_K", "60"))
+# Pages taken from each ranking (and handed to the reranker) before the final cut
+DEFAULT_CANDIDATES = int(os.getenv("HRABBIT_HYBRID_CANDIDATES", "20"))
+# sentence-transformers cross-encoder for reranking; unset disables reranking
+RERANK_MODEL = os.getenv("HRABBIT_RERANK_MODEL")
+# Characters of page text the cross-encoder reads per candidate
+RERANK_CHARS = int(os.getenv("HRABBIT_RERANK_CHARS", "2000"))
+# Cross-encoder score a page without a verbatim phrase match needs to be kept
+RERANK_MIN_SCORE = float(os.getenv("HRABBIT_RERANK_MIN_SCORE", "0"))
+# Rankings that must agree on a page without a verbatim phrase match
+MIN_RANKINGS = 2
+
+
+def reciprocal_rank_fusion(rankings, k=DEFAULT_RRF_K):
+    """
+    Fuses ranked lists of ids: an id scores the sum of 1 / (k + rank) over the lists it
+    appears in. Returns (id, score) pairs, best first; ties keep first-seen order.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(dict.fromkeys(ranking), 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _matched_terms(page, terms):
+    """Counts the query terms that occur in a page's title or text."""
+    words = set(re.findall(r"\w+", f"{page['title']}\n{page['text']}".lower()))
+    return sum(term in words for term in terms)
+
+
+class CrossEncoderReranker:
+    """Reorders candidate pages by a local sentence-transformers cross-encoder's (query, page) score."""
+
+    def __init__(self, model_name=None, max_chars=None, device="cpu"):
+        self.model_name = model_name or RERANK_MODEL or "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        self.max_chars = max_chars or RERANK_CHARS
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                # sentence-transformers pulls in torch; only load it once a rerank is needed
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise ImportError(
+                        f"Reranking with {self.model_name} needs sentence-transformers: "
+                        f"pip install sentence-transformers, or unset HRABBIT_RERANK_MODEL"
+                    ) from e
+                self._model = CrossEncoder(self.model_name, device=self.device)
+            return self._model
+
+    def rerank(self, query, pages):
+        """Returns the pages sorted by cross-encoder score (added as 'rerank_score'), best first."""
+        if not pages:
+            return []
+        pairs = [(query, f"{page['title']}\n{page['text'][:self.max_chars]}") for page in pages]
+        with span("rag.rerank", candidates=len(pages)):
+            scores = self.model.predict(pairs)
+        for page, score in zip(pages, scores):
+            page["rerank_score"] = float(score)
+        return sorted(pages, key=lambda page: page["rerank_score"], reverse=True)
+
+
+class HybridRetriever:
+    """
+    Ranks indexed pages for a query from local lookups only: verbatim phrase searches,
+    an any-word BM25 search and, when a vector store is available, the pages of the most
+    similar chunks, fused with RRF. With a reranker, the fused candidates are reordered
+    before the top k are returned.
+    """
+
+    def __init__(self, index, vector_store=None, reranker=None, rrf_k=None, candidates=None, vector_path=None):
+        self.index = index
+        self.vector_store = vector_store
+        self.reranker = reranker
+        self.rrf_k = rrf_k or DEFAULT_RRF_K
+        self.candidates = candidates or DEFAULT_CANDIDATES
+        # A PageVectorStore at vector_path is only opened on the first ranking that needs it
+        self.vector_path = vector_path
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, index):
+        """
+        Returns a retriever over index, or None if HRABBIT_HYBRID is 0. The vector store at
+        HRABBIT_VECTOR_PATH is used if one was built (src.index.sync --embed), and the
+        cross-encoder if HRABBIT_RERANK_MODEL is set and sentence-transformers is installed.
+        """
+        if os.getenv("HRABBIT_HYBRID", "1") == "0":
+            return None
+        reranker = None
+        if RERANK_MODEL:
+            # Checked without importing it, which would load torch
+            if importlib.util.find_spec("sentence_transformers") is None:
+                print("Error: HRABBIT_RERANK_MODEL is set but sentence-transformers is not installed "
+                      "(pip install sentence-transformers); continuing without reranking")
+            else:
+                reranker = CrossEncoderReranker()
+        vector_path = os.getenv("HRABBIT_VECTOR_PATH", os.path.join(DEFAULT_CACHE_DIR, "chroma"))
+        return cls(
+            index,
+            reranker=reranker,
+            vector_path=vector_path if os.path.isdir(vector_path) else None,
+        )
+
+    def _vectors(self):
+        with self._lock:
+            if self.vector_store is None and self.vector_path:
+                path, self.vector_path = self.vector_path, None
+                try:
+                    # chromadb and the embeddings client are only imported once vectors are needed
+                    from src.rag.vector_store import PageVectorStore
+                    self.vector_store = PageVectorStore(path)
+                except Exception as e:
+                    print(f"Error opening vector store, continuing with full-text search only: {e}")
+            return self.vector_store
+
+    def rank(self, query, phrases=(), k=5, exclude_ids=None):
+        """
+        Returns up to k indexed pages for the query, best first, in the shape of
+        SpaceIndex.search results plus a 'score' (fused RRF score).
+
+        Each of phrases (e.g. a ticket ID) is searched verbatim as its own ranking, and
+        pages containing a phrase verbatim are always eligible. Any other page has to be
+        found by both the keyword search (which only counts pages sharing at least two
+        content words with the query) and the vector search or, with a reranker, score
+        at least RERANK_MIN_SCORE. Without a vector store or reranker this keeps the strict
+        phrase filter: the keyword ranking only reorders verbatim matches.
+        """
+        exclude = {str(pid) for pid in exclude_ids or []}
+        n = max(self.candidates, k)
+        terms = query_terms(query)
+        pages = {}
+        strict = set()
+        rankings = []
+        with span("rag.hybrid", k=k):
+            for phrase in phrases:
+                hits = self.index.search(phrase, limit=n, exclude_ids=exclude)
+                rankings.append([hit["page_id"] for hit in hits])
+                pages.update((hit["page_id"], hit) for hit in hits)
+                strict.update(hit["page_id"] for hit in hits if phrase in hit["text"] or phrase in hit["title"])
+
+            # A page sharing one word with the query (often just the ticket's project
+            # name) is no evidence; require two, or the only one a one-word query has
+            min_terms = min(2, len(terms))
+            keyword_hits = [
+                hit for hit in self.index.search(query, limit=n, exclude_ids=exclude, any_terms=True)
+                if _matched_terms(hit, terms) >= min_terms
+            ]
+            rankings.append([hit["page_id"] for hit in keyword_hits])
+            pages.update((hit["page_id"], hit) for hit in keyword_hits)
+
+            vector_store = self._vectors()
+            if vector_store is not None:
+                try:
+                    chunks = vector_store.search(query, k=n, where={"kind": "confluence"})
+                    rankings.append([
+                        chunk.metadata["page_id"] for chunk in chunks if chunk.metadata.get("page_id") not in exclude
+                    ])
+                except Exception as e:
+                    print(f"Error searching vector store for {query}: {e}")
+
+            # Phrase rankings already count through strict; a non-verbatim page needs the
+            # keyword and vector rankings to agree on it
+            support = {}
+            for ranking in rankings[len(phrases):]:
+                for page_id in set(ranking):
+                    support[page_id] = support.get(page_id, 0) + 1
+            fused = reciprocal_rank_fusion(rankings, self.rrf_k)
+            eligible = [
+                (page_id, score) for page_id, score in fused
+                if page_id in strict or support.get(page_id, 0) >= MIN_RANKINGS or self.reranker is not None
+            ]
+
+            # The reranker picks the final k from the wider candidate set
+            results = []
+            for page_id, score in eligible[:n if self.reranker is not None else k]:
+                page = pages.get(page_id) or self.index.get_page(page_id)
+                if page is not None:
+                    results.append(dict(page, score=score))
+            if self.reranker is not None:
+                results = [
+                    page for page in self.reranker.rerank(query, results)
+                    if page["page_id"] in strict or support.get(page["page_id"], 0) >= MIN_RANKINGS
+                    or page.get("rerank_score", float("-inf")) >= RERANK_MIN_SCORE
+                ]
+        add("hybrid_candidates", len(fused))
+        add("hybrid_results", min(len(results), k))
+        return results[:k]
+
+    def ticket_pages(self, ticket_id, summary="", k=5):
+        """Ranks the pages related to a ticket: its ID verbatim, plus its ID and summary as free text."""
+        return self.rank(f"{ticket_id} {summary}".strip(), phrases=[ticket_id], k=k)
@@ -0,0 +1,437 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+from src.connectors.multi_match import MultiPatternMatcher
+from src.connectors.page_cache import DEFAULT_CACHE_DIR
+from src.index.space_index import SpaceIndex
+
+# Ticket references collected from the pages an employee owns (Confluence ticket
+# pages such as NB_0001 as well as Jira keys such as OPS-123)
+TICKET_PATTERN = re.compile(os.getenv("HRABBIT_TICKET_PATTERN", r"\b[A-Z][A-Z0-9]+[-_]\d+\b"))
+
+# A mention counts as ownership when it sits on a line starting with one of these labels
+_OWNER_LINE = re.compile(r"\s*[-*]?\s*(?:contributors?|owners?|authors?|maintainers?)\s*:")
+
+# Snippets kept per page and employee
+SNIPPETS_PER_PAGE = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    employee_key TEXT PRIMARY KEY,
+    employee TEXT NOT NULL,
+    built_at REAL NOT NULL,
+    last_touched TEXT
+);
+CREATE TABLE IF NOT EXISTS profile_pages (
+    employee_key TEXT NOT NULL,
+    page_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    source TEXT NOT NULL,
+    last_modified TEXT,
+    owned INTEGER NOT NULL,
+    snippets TEXT NOT NULL,
+    PRIMARY KEY (employee_key, page_id)
+);
+CREATE INDEX IF NOT EXISTS profile_pages_page_id ON profile_pages (page_id);
+CREATE TABLE IF NOT EXISTS profile_tickets (
+    employee_key TEXT NOT NULL,
+    key TEXT NOT NULL,
+    summary TEXT,
+    status TEXT,
+    role TEXT NOT NULL,
+    updated TEXT,
+    PRIMARY KEY (employee_key, key)
+);
+"""
+
+
+def _employee_key(employee):
+    return " ".join(employee.split()).lower()
+
+
+def _parse_timestamp(value):
+    """Parses a Confluence or Jira timestamp into an aware datetime, or None."""
+    if not value:
+        return None
+    value = value.replace("Z", "+00:00")
+    # Jira writes offsets without a colon (+0000)
+    value = re.sub(r"([+-]\d\d)(\d\d)$", r"\1:\2", value)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _latest(*values):
+    """Returns the latest of several timestamps as ISO 8601, or None."""
+    parsed = [when for when in map(_parse_timestamp, values) if when is not None and when.tzinfo is not None]
+    return max(parsed).isoformat() if parsed else None
+
+
+class ProfileStore:
+    """
+    Local SQLite store of precomputed per-employee profiles: the pages they own, the
+    pages mentioning them (with snippets), related tickets and when they last touched
+    any of it. Built offline by build_profiles() from the synced space index and Jira,
+    so the agent gets a whole profile in one tool call.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "profiles.sqlite")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Returns the store at HRABBIT_PROFILE_PATH (or the default cache location),
+        or None if no profiles have been built there yet.
+        """
+        path = os.getenv("HRABBIT_PROFILE_PATH", os.path.join(DEFAULT_CACHE_DIR, "profiles.sqlite"))
+        if not os.path.exists(path):
+            return None
+        try:
+            store = cls(path)
+        except sqlite3.Error as e:
+            print(f"Error opening profile store, continuing without it: {e}")
+            return None
+        return store if store.employees() else None
+
+    def save_profile(self, employee, pages, tickets, last_touched=None):
+        """
+        Replaces an employee's profile.
+        pages: dicts with page_id, title, source, last_modified, owned and snippets.
+        tickets: dicts with key, summary, status, role and updated.
+        """
+        key = _employee_key(employee)
+        with self._lock:
+            self._db.execute("DELETE FROM profile_pages WHERE employee_key = ?", (key,))
+            self._db.execute("DELETE FROM profile_tickets WHERE employee_key = ?", (key,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO profiles (employee_key, employee, built_at, last_touched) VALUES (?, ?, ?, ?)",
+                (key, employee, time.time(), last_touched),
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO profile_pages "
+                "(employee_key, page_id, title, source, last_modified, owned, snippets) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (key, str(page['page_id']), page['title'], page['source'], page.get('last_modified'),
+                     int(page['owned']), json.dumps([str(snippet) for snippet in page['snippets']]))
+                    for page in pages
+                ],
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO profile_tickets (employee_key, key, summary, status, role, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (key, ticket['key'], ticket.get('summary'), ticket.get('status'), ticket['role'],
+                     ticket.get('updated'))
+                    for ticket in tickets
+                ],
+            )
+            self._db.commit()
+
+    def get_profile(self, employee):
+        """
+        Returns an employee's profile (names are matched case-insensitively), or None:
+        {employee, built_at, last_touched, owned_pages, mentions, tickets}, with pages
+        and tickets most recently modified first.
+        """
+        key = _employee_key(employee)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT employee, built_at, last_touched FROM profiles WHERE employee_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            pages = self._db.execute(
+                "SELECT page_id, title, source, last_modified, owned, snippets FROM profile_pages "
+                "WHERE employee_key = ? ORDER BY last_modified DESC",
+                (key,),
+            ).fetchall()
+            tickets = self._db.execute(
+                "SELECT key, summary, status, role, updated FROM profile_tickets "
+                "WHERE employee_key = ? ORDER BY updated DESC",
+                (key,),
+            ).fetchall()
+
+        name, built_at, last_touched = row
+        profile = {
+            "employee": name,
+            "built_at": built_at,
+            "last_touched": last_touched,
+            "owned_pages": [],
+            "mentions": [],
+            "tickets": [
+                {"key": ticket_key, "summary": summary, "status": status, "role": role, "updated": updated}
+                for ticket_key, summary, status, role, updated in tickets
+            ],
+        }
+        for page_id, title, source, last_modified, owned, snippets in pages:
+            page = {
+                "page_id": page_id,
+                "title": title,
+                "source": source,
+                "last_modified": last_modified,
+                "snippets": json.loads(snippets),
+            }
+            profile["owned_pages" if owned else "mentions"].append(page)
+        return profile
+
+    def employees(self):
+        """Returns the names of every profiled employee."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT employee FROM profiles ORDER BY employee")]
+
+    def employees_for_page(self, page_id):
+        """Returns the employees whose profile includes the page."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT p.employee FROM profile_pages pp JOIN profiles p ON p.employee_key = pp.employee_key "
+                "WHERE pp.page_id = ?",
+                (str(page_id),),
+            )
+            return [row[0] for row in rows]
+
+    def replace_page_entries(self, page_id, found):
+        """
+        Replaces one page's entries in every profile with found ({employee: (entry, tickets)},
+        as returned by scan_page; empty to drop the page). New ticket references are added
+        and last_touched moves forward for pages the employee owns.
+        Returns the employees whose profile changed.
+        """
+        page_id = str(page_id)
+        changed = set(self.employees_for_page(page_id))
+        with self._lock:
+            self._db.execute("DELETE FROM profile_pages WHERE page_id = ?", (page_id,))
+            for employee, (entry, tickets) in found.items():
+                key = _employee_key(employee)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO profile_pages "
+                    "(employee_key, page_id, title, source, last_modified, owned, snippets) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, page_id, entry['title'], entry['source'], entry.get('last_modified'),
+                     int(entry['owned']), json.dumps([str(snippet) for snippet in entry['snippets']])),
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO profile_tickets (employee_key, key, role) VALUES (?, ?, 'owned page')",
+                    [(key, ticket_key) for ticket_key in sorted(tickets)],
+                )
+                if entry['owned']:
+                    row = self._db.execute(
+                        "SELECT last_touched FROM profiles WHERE employee_key = ?", (key,)
+                    ).fetchone()
+                    self._db.execute(
+                        "UPDATE profiles SET last_touched = ? WHERE employee_key = ?",
+                        (_latest(row[0] if row else None, entry.get('last_modified')), key),
+                    )
+                changed.add(employee)
+            self._db.commit()
+        return sorted(changed)
+
+    def update_ticket(self, ticket):
+        """
+        Refreshes the summary, status and updated time of a ticket in every profile that
+        references it (ticket as returned by JiraConnector.iter_issues). Returns the number
+        of profiles updated.
+        """
+        with self._lock:
+            count = self._db.execute(
+                "UPDATE profile_tickets SET summary = ?, status = ?, updated = ? WHERE key = ?",
+                (ticket.get('summary'), ticket.get('status'), ticket.get('updated'), ticket['key']),
+            ).rowcount
+            self._db.commit()
+        return count
+
+    def remove_ticket(self, key):
+        """Drops a deleted ticket from every profile."""
+        with self._lock:
+            self._db.execute("DELETE FROM profile_tickets WHERE key = ?", (key,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _is_owner_mention(lower, pos):
+    """True if the mention at pos follows an owner/contributor label on the same line."""
+    line_start = lower.rfind("\n", 0, pos) + 1
+    return bool(_OWNER_LINE.match(lower, line_start, pos))
+
+
+def scan_page(page, employees, matcher, context_chars=120):
+    """
+    Matches all employees against one indexed page. Returns {employee: (entry, tickets)}
+    for the employees mentioned, where entry is a page entry (see ProfileStore.save_profile)
+    and tickets the ticket references on the page if they own it.
+    """
+    text = page["text"]
+    lower = text.lower()
+    positions = {}
+    for pos, i in matcher.finditer(lower):
+        positions.setdefault(i, []).append(pos)
+
+    found = {}
+    for i, matches in positions.items():
+        employee = employees[i]
+        owned = any(_is_owner_mention(lower, pos) for pos in matches)
+        snippets = []
+        end = 0
+        for pos in matches:
+            if pos < end:
+                # Already inside the previous snippet
+                continue
+            start = max(0, pos - context_chars)
+            end = min(len(text), pos + len(employee) + context_chars)
+            snippets.append(text[start:end].strip())
+            if len(snippets) == SNIPPETS_PER_PAGE:
+                break
+        entry = {
+            "page_id": page["page_id"],
+            "title": page["title"],
+            "source": page["source"],
+            "last_modified": page["last_modified"],
+            "owned": owned,
+            "snippets": snippets,
+        }
+        tickets = set(TICKET_PATTERN.findall(page["title"] + "\n" + text)) if owned else set()
+        found[employee] = (entry, tickets)
+    return found
+
+
+def scan_index(index, employees, context_chars=120, space_key=None):
+    """
+    Reads every indexed page once, matching all employees in a single pass per page.
+    Returns a dict mapping each employee to their page entries (see ProfileStore.save_profile)
+    and the ticket references found on the pages they own.
+    """
+    employees = [e for e in dict.fromkeys(e.strip() for e in employees) if e]
+    matcher = MultiPatternMatcher(employees)
+    scanned = {employee: {"pages": [], "tickets": set()} for employee in employees}
+    for page in index.iter_pages(space_key=space_key):
+        for employee, (entry, tickets) in scan_page(page, employees, matcher, context_chars).items():
+            scanned[employee]["pages"].append(entry)
+            scanned[employee]["tickets"].update(tickets)
+    return scanned
+
+
+def refresh_page(store, page, context_chars=120):
+    """
+    Brings every existing profile up to date with one changed page (as returned by
+    SpaceIndex.get_page) without rebuilding the profiles. Removed pages are dropped with
+    store.replace_page_entries(page_id, {}). Returns the employees whose profile changed.
+    """
+    employees = store.employees()
+    if not employees:
+        return []
+    matcher = MultiPatternMatcher(employees)
+    found = scan_page(page, employees, matcher, context_chars)
+    return store.replace_page_entries(page["page_id"], found)
+
+
+def build_profiles(index, store, employees, jira=None, context_chars=120, space_key=None):
+    """
+    Builds and saves the profiles of the given employees from the local space index
+    and, with a JiraConnector, their Jira history (issues they are assignee or reporter of).
+    Returns a dict with the number of profiles, pages and tickets written.
+    """
+    scanned = scan_index(index, employees, context_chars=context_chars, space_key=space_key)
+    histories = jira.get_employee_histories(list(scanned)) if jira is not None else {}
+
+    stats = {"profiles": 0, "pages": 0, "tickets": 0}
+    for employee, found in scanned.items():
+        tickets = {}
+        for issue in histories.get(employee, []):
+            role = "assignee" if _employee_key(issue.get("assignee") or "") == _employee_key(employee) else "reporter"
+            tickets[issue["key"]] = {
+                "key": issue["key"],
+                "summary": issue.get("summary"),
+                "status": issue.get("status"),
+                "role": role,
+                "updated": issue.get("updated"),
+            }
+        for ticket_key in sorted(found["tickets"]):
+            tickets.setdefault(ticket_key, {"key": ticket_key, "role": "owned page"})
+
+        last_touched = _latest(
+            *(page["last_modified"] for page in found["pages"] if page["owned"]),
+            *(ticket.get("updated") for ticket in tickets.values()),
+        )
+        store.save_profile(employee, found["pages"], list(tickets.values()), last_touched=last_touched)
+        stats["profiles"] += 1
+        stats["pages"] += len(found["pages"])
+        stats["tickets"] += len(tickets)
+    return stats
+
+
+def discover_employees(index, space_key=None):
+    """Returns the names listed after owner/contributor labels anywhere in the index."""
+    label = re.compile(
+        r"^\s*[-*]?\s*(?:contributors?|owners?|authors?|maintainers?)\s*:\s*(.+)$", re.I | re.M
+    )
+    names = {}
+    for page in index.iter_pages(space_key=space_key):
+        for match in label.finditer(page["text"]):
+            for name in re.split(r"[,;]| and ", match.group(1)):
+                name = name.strip().rstrip(".")
+                # Keep names of two to four capitalised words
+                if re.fullmatch(r"[A-Z][\w'.-]+(?: [A-Z][\w'.-]+){1,3}", name):
+                    names.setdefault(_employee_key(name), name)
+    return sorted(names.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute employee profiles from the local index and Jira")
+    parser.add_argument("--employee", action="append", default=[], help="Employee name or email (repeatable)")
+    parser.add_argument("--discover", action="store_true",
+                        help="Also profile everyone listed as owner/contributor on an indexed page")
+    parser.add_argument("--space", help="Only read pages from this space")
+    parser.add_argument("--index", help="Index file (default: HRABBIT_INDEX_PATH or the cache directory)")
+    parser.add_argument("--profiles", help="Profile store (default: HRABBIT_PROFILE_PATH or the cache directory)")
+
+    args = parser.parse_args()
+
+    # The tools import this module for ProfileStore; keep dotenv out of their cold start
+    from dotenv import load_dotenv
+    load_dotenv()
+    index = SpaceIndex(args.index or os.getenv("HRABBIT_INDEX_PATH"))
+    if not index.page_count():
+        print("Error: The index is empty. Run src.index.sync first.")
+        return
+
+    employees = list(args.employee)
+    if args.discover:
+        employees += discover_employees(index, space_key=args.space)
+    if not employees:
+        print("Error: No employees given. Use --employee or --discover.")
+        return
+
+    # Jira history is included when a Jira site is configured
+    jira = None
+    jira_url = os.getenv("JIRA_URL")
+    if jira_url:
+        from src.connectors.jira_loader import JiraConnector
+        jira = JiraConnector(jira_url, os.getenv("ATLASSIAN_USERNAME"), os.getenv("ATLASSIAN_API_TOKEN"))
+
+    store = ProfileStore(args.profiles or os.getenv("HRABBIT_PROFILE_PATH"))
+    print(f"Building profiles for {len(employees)} employee(s)...")
+    try:
+        stats = build_profiles(index, store, employees, jira=jira, space_key=args.space)
+    finally:
+        if jira is not None:
+            jira.close()
+    print(f"  profiles {stats['profiles']}, pages {stats['pages']}, tickets {stats['tickets']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+import os
+import re
+import sqlite3
+import threading
+
+from src.connectors.page_cache import DEFAULT_CACHE_DIR
+from src.connectors.documents import page_metadata
+from src.connectors.storage_text import storage_to_text
+from src.connectors.text_store import text_store
+
+# Recorded in meta as 'schema_version'; bump it (and teach _migrate the step) when _SCHEMA changes
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    rowid INTEGER PRIMARY KEY,
+    page_id TEXT NOT NULL UNIQUE,
+    space_key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    source TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    last_modified TEXT
+);
+CREATE INDEX IF NOT EXISTS pages_space_key ON pages (space_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+    page_id UNINDEXED,
+    title,
+    text,
+    tokenize = 'unicode61'
+);
+-- pages_fts rows share the rowid of their pages row
+CREATE TABLE IF NOT EXISTS sync_state (
+    space_key TEXT PRIMARY KEY,
+    watermark TEXT
+);
+"""
+
+# Version 1 keyed pages by page_id and gave FTS rows rowids of their own; move both onto
+# the shared rowid without re-downloading anything
+_MIGRATE_V1 = """
+BEGIN;
+DROP INDEX IF EXISTS pages_space_key;
+ALTER TABLE pages RENAME TO pages_v1;
+ALTER TABLE pages_fts RENAME TO pages_fts_v1;
+""" + _SCHEMA + """
+INSERT INTO pages (page_id, space_key, title, source, version, last_modified)
+    SELECT page_id, space_key, title, source, version, last_modified FROM pages_v1;
+INSERT INTO pages_fts (rowid, page_id, title, text)
+    SELECT pages.rowid, pages_fts_v1.page_id, pages_fts_v1.title, pages_fts_v1.text
+    FROM pages_fts_v1 JOIN pages ON pages.page_id = pages_fts_v1.page_id;
+DROP TABLE pages_v1;
+DROP TABLE pages_fts_v1;
+COMMIT;
+"""
+
+# Any other version (e.g. a file written by a newer release) is emptied, and its cleared
+# watermarks make the next sync re-index every page
+_RESET = """
+BEGIN;
+DROP TABLE IF EXISTS pages_fts;
+DROP TABLE IF EXISTS pages;
+DROP TABLE IF EXISTS sync_state;
+""" + _SCHEMA + """
+COMMIT;
+"""
+
+
+def _phrase(query):
+    """Quotes a free-text query as a single FTS5 phrase so user input can't break the MATCH syntax."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+# Words too common to say anything about a page's topic; left out of any-word searches
+STOP_WORDS = frozenset("""
+a an and are as at be but by for from has have how in into is it its not of on or our
+that the their then there these this to was we were what when where which who why will with
+""".split())
+
+
+def query_terms(query):
+    """Returns the distinct lowercased words of a query, without stop words and single characters."""
+    terms = dict.fromkeys(re.findall(r"\w+", query.lower()))
+    return [term for term in terms if len(term) > 1 and term not in STOP_WORDS]
+
+
+def _any_terms(query):
+    """Turns a free-text query into an FTS5 OR of its quoted content words, so pages matching any of them rank by BM25."""
+    return " OR ".join(_phrase(term) for term in query_terms(query))
+
+
+class SpaceIndex:
+    """
+    Local SQLite FTS5 index over the stripped text of mirrored Confluence spaces.
+    Filled by src.index.sync and queried by the connectors before falling back to live CQL.
+    """
+
+    def __init__(self, path=None, site=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "index.sqlite")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+        if site:
+            self._set_meta("site", site.rstrip("/"))
+
+    @classmethod
+    def from_env(cls):
+        """
+        Returns the index at HRABBIT_INDEX_PATH (or the default cache location),
+        or None if no space has been synced there yet.
+        """
+        path = os.getenv("HRABBIT_INDEX_PATH", os.path.join(DEFAULT_CACHE_DIR, "index.sqlite"))
+        if not os.path.exists(path):
+            return None
+        try:
+            index = cls(path)
+        except sqlite3.Error as e:
+            print(f"Error opening search index, continuing without it: {e}")
+            return None
+        return index if index.page_count() else None
+
+    @property
+    def site(self):
+        return self._get_meta("site")
+
+    # --- Sync bookkeeping ---
+
+    def get_watermark(self, space_key):
+        """Returns the last-modified timestamp (ISO 8601) the space was synced up to, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT watermark FROM sync_state WHERE space_key = ?", (space_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, space_key, watermark):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state (space_key, watermark) VALUES (?, ?)", (space_key, watermark)
+            )
+            self._db.commit()
+
+    def page_versions(self, space_key=None):
+        """Returns a dict of page id to indexed version, optionally limited to one space."""
+        with self._lock:
+            if space_key:
+                rows = self._db.execute("SELECT page_id, version FROM pages WHERE space_key = ?", (space_key,))
+            else:
+                rows = self._db.execute("SELECT page_id, version FROM pages")
+            return dict(rows.fetchall())
+
+    def page_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def upsert_page(self, page_id, space_key, title, source, version, last_modified, body):
+        """Adds or replaces a page, indexing the stripped text of its storage-format body."""
+        page_id = str(page_id)
+        text = storage_to_text(body, page_id, version)
+        with self._lock:
+            self._delete(page_id)
+            rowid = self._db.execute(
+                "INSERT INTO pages (page_id, space_key, title, source, version, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (page_id, space_key, title, source, version, last_modified),
+            ).lastrowid
+            self._db.execute(
+                "INSERT INTO pages_fts (rowid, page_id, title, text) VALUES (?, ?, ?, ?)",
+                (rowid, page_id, title, text),
+            )
+            self._db.commit()
+
+    def remove_page(self, page_id):
+        page_id = str(page_id)
+        with self._lock:
+            self._delete(page_id)
+            self._db.commit()
+
+    def _delete(self, page_id):
+        """Deletes a page and its FTS row, which shares the page's rowid. Caller holds the lock."""
+        row = self._db.execute("SELECT rowid FROM pages WHERE page_id = ?", (page_id,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM pages_fts WHERE rowid = ?", (row[0],))
+            self._db.execute("DELETE FROM pages WHERE rowid = ?", (row[0],))
+
+    # --- Queries ---
+
+    def search(self, query, limit=5, exclude_ids=None, any_terms=False):
+        """
+        Full-text search for a phrase (or, with any_terms, for any of the query's words
+        other than stop words), best BM25 matches first.
+        Returns a list of dicts with page_id, title, source, version and text.
+        """
+        match = _any_terms(query) if any_terms else _phrase(query)
+        if not match:
+            return []
+        exclude_ids = [str(pid) for pid in exclude_ids or []]
+        sql = (
+            "SELECT p.page_id, p.title, p.source, p.version, f.text "
+            "FROM pages_fts f JOIN pages p ON p.rowid = f.rowid "
+            "WHERE pages_fts MATCH ?"
+        )
+        params = [match]
+        if exclude_ids:
+            sql += f" AND p.page_id NOT IN ({', '.join('?' for _ in exclude_ids)})"
+            params.extend(exclude_ids)
+        sql += " ORDER BY bm25(pages_fts) LIMIT ?"
+        params.append(limit)
+        try:
+            with self._lock:
+                rows = self._db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error searching index for {query}: {e}")
+            return []
+        return [
+            {"page_id": page_id, "title": title, "source": source, "version": version, "text": text}
+            for page_id, title, source, version, text in rows
+        ]
+
+    def get_page(self, page_id):
+        """Returns an indexed page (same shape as search results, plus space_key and last_modified), or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT p.page_id, p.space_key, p.title, p.source, p.version, p.last_modified, f.text "
+                "FROM pages p JOIN pages_fts f ON f.rowid = p.rowid WHERE p.page_id = ?",
+                (str(page_id),),
+            ).fetchone()
+        if row is None:
+            return None
+        page_id, space_key, title, source, version, last_modified, text = row
+        return {
+            "page_id": page_id, "space_key": space_key, "title": title, "source": source,
+            "version": version, "last_modified": last_modified, "text": text,
+        }
+
+    def iter_pages(self, space_key=None, batch_size=200):
+        """
+        Yields every indexed page (same shape as get_page), reading batch_size rows at a time.
+        """
+        sql = (
+            "SELECT p.rowid, p.page_id, p.space_key, p.title, p.source, p.version, p.last_modified, f.text "
+            "FROM pages p JOIN pages_fts f ON f.rowid = p.rowid WHERE p.rowid > ?"
+        )
+        params = []
+        if space_key:
+            sql += " AND p.space_key = ?"
+            params.append(space_key)
+        sql += " ORDER BY p.rowid LIMIT ?"
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(sql, [last_rowid, *params, batch_size]).fetchall()
+            for _, page_id, page_space, title, source, version, last_modified, text in rows:
+                yield {
+                    "page_id": page_id, "space_key": page_space, "title": title, "source": source,
+                    "version": version, "last_modified": last_modified, "text": text,
+                }
+            if len(rows) < batch_size:
+                return
+            last_rowid = rows[-1][0]
+
+    def find_ticket(self, ticket_id):
+        """Returns the best-matching page whose text contains ticket_id verbatim, or None."""
+        for page in self.search(ticket_id, limit=5):
+            if ticket_id in page["text"] or ticket_id in page["title"]:
+                return page
+        return None
+
+    def find_contributor(self, identifier, limit=20, context_chars=120, spill=None):
+        """
+        Finds indexed pages mentioning an employee name or email.
+        Returns the same shape as ConfluenceConnector.search_contributors, with snippets
+        as TextViews into the page text.
+        """
+        store = text_store(spill)
+        matches = []
+        search_lower = identifier.lower()
+        for page in self.search(identifier, limit=limit):
+            text = page["text"]
+            lower = text.lower()
+            start = 0
+            windows = []
+            while True:
+                pos = lower.find(search_lower, start)
+                if pos == -1:
+                    break
+                s = max(0, pos - context_chars)
+                e = min(len(text), pos + len(identifier) + context_chars)
+                windows.append((s, e))
+                start = pos + len(identifier)
+            if windows:
+                matches.append({
+                    **page_metadata(page["page_id"], page["title"], page["source"]),
+                    "matches": store.put(text, windows)[1],
+                })
+        return matches
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _migrate(self):
+        """Brings an index file written with an older schema up to SCHEMA_VERSION."""
+        version = self._get_meta("schema_version")
+        if version is None:
+            # Files from before the version was recorded: only version 2 declares a rowid column
+            with self._lock:
+                columns = [row[1] for row in self._db.execute("PRAGMA table_info(pages)")]
+            version = 2 if "rowid" in columns else 1
+        version = int(version)
+        if version != SCHEMA_VERSION:
+            print(f"Migrating search index {self.path} from schema version {version} to {SCHEMA_VERSION}")
+            with self._lock:
+                self._db.executescript(_MIGRATE_V1 if version == 1 else _RESET)
+        self._set_meta("schema_version", str(SCHEMA_VERSION))
+
+    def _get_meta(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._db.commit()
@@ -0,0 +1,138 @@
+import os
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+from src.connectors.confluence_loader import ConfluenceConnector
+from src.connectors.storage_text import storage_to_text
+from src.index.space_index import SpaceIndex
+
+# How far before the watermark to re-list pages. CQL compares lastmodified at
+# minute resolution in the user's timezone, and re-listed pages whose version
+# is already indexed only cost their metadata.
+DEFAULT_OVERLAP_MINUTES = int(os.getenv("HRABBIT_SYNC_OVERLAP_MINUTES", "1440"))
+
+# Pages whose bodies are downloaded and indexed together
+SYNC_BATCH_SIZE = 50
+
+
+def _parse_when(value):
+    """Parses a Confluence version.when timestamp into an aware datetime."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def sync_space(connector, index, space_key, full=False, overlap_minutes=DEFAULT_OVERLAP_MINUTES, vector_store=None):
+    """
+    Mirrors a Confluence space into the local index.
+    Only pages modified since the space's watermark are listed, and only pages whose
+    version differs from the indexed one are downloaded. A full sync lists every page
+    and also drops indexed pages that no longer exist.
+    With a vector_store, changed pages are also (re-)embedded; unchanged chunks are skipped.
+    Returns a dict with the number of pages listed, updated and removed.
+    """
+    watermark = None if full else index.get_watermark(space_key)
+    cql = f'space = "{space_key}" AND type = "page"'
+    if watermark:
+        since = _parse_when(watermark) - timedelta(minutes=overlap_minutes)
+        cql += f' AND lastmodified >= "{since.strftime("%Y-%m-%d %H:%M")}"'
+    cql += ' ORDER BY lastmodified ASC'
+
+    indexed = index.page_versions(space_key)
+    stats = {"listed": 0, "updated": 0, "removed": 0}
+    seen = set()
+    pending = []
+    newest = _parse_when(watermark) if watermark else None
+
+    def flush():
+        bodies = connector.get_bodies([content['id'] for content in pending])
+        for content in pending:
+            index.upsert_page(
+                content['id'],
+                space_key,
+                content['title'],
+                content['_links']['webui'],
+                content['version']['number'],
+                content['version'].get('when'),
+                bodies.get(content['id'], ''),
+            )
+            if vector_store is not None:
+                vector_store.add_confluence_page(
+                    content['id'],
+                    content['title'],
+                    storage_to_text(bodies.get(content['id'], ''), content['id'], content['version']['number']),
+                    source=content['_links']['webui'],
+                    space_key=space_key,
+                    version=content['version']['number'],
+                )
+        stats["updated"] += len(pending)
+        pending.clear()
+
+    for result in connector.iter_search_results(cql, expand='content.version'):
+        content = result.get('content')
+        if not content:
+            continue
+        stats["listed"] += 1
+        seen.add(content['id'])
+
+        when = content['version'].get('when')
+        if when and (newest is None or _parse_when(when) > newest):
+            newest = _parse_when(when)
+
+        if indexed.get(content['id']) != content['version']['number']:
+            pending.append(content)
+            if len(pending) >= SYNC_BATCH_SIZE:
+                flush()
+        elif full and vector_store is not None:
+            # Backfill embeddings for pages indexed before --embed was used,
+            # from the indexed text rather than a new download
+            page = index.get_page(content['id'])
+            vector_store.add_confluence_page(
+                page['page_id'], page['title'], page['text'],
+                source=page['source'], space_key=space_key, version=page['version'],
+            )
+    if pending:
+        flush()
+
+    if full:
+        for page_id in set(indexed) - seen:
+            index.remove_page(page_id)
+            if vector_store is not None:
+                vector_store.remove_document(page_id)
+            stats["removed"] += 1
+
+    if newest is not None:
+        index.set_watermark(space_key, newest.isoformat())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mirror Confluence spaces into the local search index")
+    parser.add_argument("--space", action="append", required=True, help="Space key to sync (repeatable)")
+    parser.add_argument("--full", action="store_true", help="Re-list every page and drop deleted ones")
+    parser.add_argument("--index", help="Index file (default: HRABBIT_INDEX_PATH or the cache directory)")
+    parser.add_argument("--embed", action="store_true", help="Also embed changed pages into the vector store")
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    confluence_url = os.getenv("CONFLUENCE_URL")
+    username = os.getenv("ATLASSIAN_USERNAME")
+    api_token = os.getenv("ATLASSIAN_API_TOKEN")
+    if not all([confluence_url, username, api_token]):
+        print("Error: Missing environment variables. Please check .env file.")
+        return
+
+    connector = ConfluenceConnector(confluence_url, username, api_token)
+    index = SpaceIndex(args.index or os.getenv("HRABBIT_INDEX_PATH"), site=confluence_url)
+    vector_store = None
+    if args.embed:
+        from src.rag.vector_store import PageVectorStore
+        vector_store = PageVectorStore()
+    for space_key in args.space:
+        print(f"Syncing space {space_key}...")
+        stats = sync_space(connector, index, space_key, full=args.full, vector_store=vector_store)
+        print(f"  listed {stats['listed']}, updated {stats['updated']}, removed {stats['removed']}")
+
+
+if __name__ == "__main__":
+    main()
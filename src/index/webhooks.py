@@ -0,0 +1,519 @@
+"""
+Keeps the local index fresh from Confluence and Jira webhooks instead of re-syncing.
+
+    python -m src.index.webhooks serve --port 8765 --record events.jsonl
+    python -m src.index.webhooks replay events.jsonl --url http://127.0.0.1:8765
+
+Register http://<host>:<port>/confluence/<event> (Confluence payloads don't name their
+event) and http://<host>:<port>/jira for Jira. Events are queued per page or issue and
+coalesced, so a burst of edits to one page results in a single fetch once it has been
+quiet for the coalescing delay.
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.request
+from urllib.parse import parse_qs, urlparse
+
+from src.connectors.jira_loader import issue_record
+from src.connectors.storage_text import storage_to_text
+from src.index.profiles import refresh_page
+from src.telemetry import add, span
+
+DEFAULT_WEBHOOK_PORT = int(os.getenv("HRABBIT_WEBHOOK_PORT", "8765"))
+# Seconds a page or issue must be quiet before its queued change is applied
+DEFAULT_COALESCE_SECONDS = float(os.getenv("HRABBIT_WEBHOOK_COALESCE", "2"))
+# Shared secret: Jira's X-Hub-Signature HMAC, or a ?secret= query parameter
+WEBHOOK_SECRET = os.getenv("HRABBIT_WEBHOOK_SECRET")
+# Times a change that failed to apply is retried (with exponential backoff) before it is dropped
+DEFAULT_WEBHOOK_RETRIES = int(os.getenv("HRABBIT_WEBHOOK_RETRIES", "5"))
+
+PAGE_EVENTS = {
+    "page_created": "update",
+    "page_updated": "update",
+    "page_restored": "update",
+    "page_moved": "update",
+    "page_removed": "remove",
+    "page_trashed": "remove",
+}
+ISSUE_EVENTS = {
+    "issue_created": "update",
+    "issue_updated": "update",
+    "issue_deleted": "remove",
+}
+
+
+def parse_event(payload, path=""):
+    """
+    Reads a webhook payload. The event name comes from webhookEvent (Jira, e.g.
+    'jira:issue_updated'), event, or the last segment of the request path.
+    Returns (key, action, data) where key is ('page', id) or ('issue', key) and
+    action is 'update' or 'remove', or None for events that don't affect the index.
+    """
+    name = payload.get("webhookEvent") or payload.get("event") or urlparse(path).path.rstrip("/").rsplit("/", 1)[-1]
+    name = name.rsplit(":", 1)[-1]
+    if name in PAGE_EVENTS:
+        page = payload.get("page") or payload.get("content") or {}
+        if page.get("id") is None:
+            return None
+        return ("page", str(page["id"])), PAGE_EVENTS[name], page
+    if name in ISSUE_EVENTS:
+        issue = payload.get("issue") or {}
+        if not issue.get("key"):
+            return None
+        return ("issue", issue["key"]), ISSUE_EVENTS[name], issue
+    return None
+
+
+class CoalescingQueue:
+    """
+    Pending changes keyed by record. An event for a record that is already queued
+    replaces it (the latest action wins) and pushes its due time back by `delay`, up to
+    max_delay after the first event, so a page edited continuously is still updated.
+    Changes that failed to apply come back through retry(), which never overrides a
+    newer event for the same record.
+    """
+
+    def __init__(self, delay=None, max_delay=None):
+        self.delay = DEFAULT_COALESCE_SECONDS if delay is None else delay
+        self.max_delay = max_delay if max_delay is not None else self.delay * 10
+        self.received = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def put(self, key, action, data):
+        with self._cond:
+            now = time.monotonic()
+            self.received += 1
+            entry = self._pending.get(key)
+            if entry is not None:
+                self.coalesced += 1
+            first_seen = entry[2] if entry is not None else now
+            due = min(now + self.delay, first_seen + self.max_delay)
+            # A new event starts a new retry count
+            self._pending[key] = (action, data, first_seen, due, 0)
+            self._cond.notify()
+
+    def retry(self, key, action, data, attempts, max_attempts=None):
+        """
+        Re-queues a change that failed to apply after `attempts` earlier failures, backing
+        off exponentially. A newer event already pending for the record supersedes the
+        failed change and is left alone. Returns 'retried', 'superseded' or 'dropped'
+        (after max_attempts retries, default HRABBIT_WEBHOOK_RETRIES).
+        """
+        max_attempts = DEFAULT_WEBHOOK_RETRIES if max_attempts is None else max_attempts
+        with self._cond:
+            if key in self._pending:
+                return "superseded"
+            if attempts >= max_attempts:
+                return "dropped"
+            now = time.monotonic()
+            self._pending[key] = (action, data, now, now + max(self.delay, 1.0) * 2 ** attempts, attempts + 1)
+            self._cond.notify()
+            return "retried"
+
+    def take(self, timeout=None):
+        """
+        Waits until at least one change is due and returns every due change as
+        (key, action, data, attempts) tuples, attempts counting its failed applies.
+        Returns an empty list on timeout, and everything still pending once the queue
+        is closed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                due = [key for key, entry in self._pending.items() if entry[3] <= now or self._closed]
+                if due:
+                    changes = []
+                    for key in due:
+                        action, data, _, _, attempts = self._pending.pop(key)
+                        changes.append((key, action, data, attempts))
+                    return changes
+                if self._closed or (deadline is not None and now >= deadline):
+                    return []
+                waits = [entry[3] - now for entry in self._pending.values()]
+                if deadline is not None:
+                    waits.append(deadline - now)
+                self._cond.wait(min(waits) if waits else None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+
+class IndexUpdater:
+    """
+    Applies coalesced page and issue changes to the local index and, when given, the
+    connector's page cache, a PageVectorStore and a ProfileStore. Only pages in synced
+    spaces (or already indexed) are added; page bodies are fetched in bulk.
+    """
+
+    def __init__(self, connector, index, vector_store=None, profiles=None):
+        self.connector = connector
+        self.index = index
+        self.vector_store = vector_store
+        self.profiles = profiles
+
+    def apply(self, changes):
+        """
+        Applies (key, action, data) changes, each with its own error handling so one bad
+        change can't hold back the others. Returns (stats, failed): counts of what was
+        updated, removed, skipped and failed, and the (change, error) pairs that failed.
+        """
+        stats = {"pages_updated": 0, "pages_removed": 0, "pages_skipped": 0, "issues_updated": 0,
+                 "issues_removed": 0, "failed": 0}
+        failed = []
+        updates, removals = [], []
+        with span("webhooks.apply", changes=len(changes)):
+            for change in changes:
+                (kind, record_id), action, data = change
+                try:
+                    if kind == "issue":
+                        self._apply_issue(record_id, action, data, stats)
+                    elif action == "remove":
+                        removals.append(change)
+                    elif self._is_current(record_id, data):
+                        # A repeated delivery of a version we already have
+                        stats["pages_skipped"] += 1
+                    else:
+                        updates.append(change)
+                except Exception as e:
+                    failed.append((change, e))
+
+            contents = {}
+            if updates:
+                try:
+                    contents = self.connector.get_pages([change[0][1] for change in updates])
+                except Exception as e:
+                    failed.extend((change, e) for change in updates)
+                    updates = []
+            for change in updates:
+                content = contents.get(change[0][1])
+                try:
+                    if content is None:
+                        # Deleted (or no longer visible) by the time it was fetched
+                        removals.append(change)
+                    elif self._update_page(content):
+                        stats["pages_updated"] += 1
+                    else:
+                        stats["pages_skipped"] += 1
+                except Exception as e:
+                    failed.append((change, e))
+            for change in removals:
+                try:
+                    self._remove_page(change[0][1])
+                    stats["pages_removed"] += 1
+                except Exception as e:
+                    failed.append((change, e))
+        stats["failed"] = len(failed)
+        return stats, failed
+
+    def _is_current(self, page_id, data):
+        version = data.get("version")
+        if isinstance(version, dict):
+            version = version.get("number")
+        indexed = self.index.get_page(page_id)
+        return indexed is not None and version is not None and indexed["version"] == version
+
+    def _update_page(self, content):
+        page_id = str(content['id'])
+        indexed = self.index.get_page(page_id)
+        space_key = (content.get('space') or {}).get('key') or (indexed or {}).get('space_key')
+        if indexed is None and not (space_key and self.index.get_watermark(space_key)):
+            return False
+        version = content['version']['number']
+        body = (content.get('body') or {}).get('storage', {}).get('value') or ''
+        source = content['_links']['webui']
+
+        self.index.upsert_page(page_id, space_key, content['title'], source, version,
+                               content['version'].get('when'), body)
+        if self.connector.page_cache is not None:
+            self.connector.page_cache.put(self.connector.site, page_id, version, body)
+        if self.vector_store is not None:
+            self.vector_store.add_confluence_page(
+                page_id, content['title'], storage_to_text(body, page_id, version),
+                source=source, space_key=space_key, version=version,
+            )
+        if self.profiles is not None:
+            refresh_page(self.profiles, self.index.get_page(page_id))
+        return True
+
+    def _remove_page(self, page_id):
+        self.index.remove_page(page_id)
+        if self.connector.page_cache is not None:
+            self.connector.page_cache.invalidate(self.connector.site, page_id)
+        if self.vector_store is not None:
+            self.vector_store.remove_document(page_id)
+        if self.profiles is not None:
+            self.profiles.replace_page_entries(page_id, {})
+
+    def _apply_issue(self, key, action, data, stats):
+        if action == "remove":
+            if self.vector_store is not None:
+                self.vector_store.remove_document(f"jira:{key}")
+            if self.profiles is not None:
+                self.profiles.remove_ticket(key)
+            stats["issues_removed"] += 1
+            return
+        # Jira sends the whole issue, and the queue kept the latest delivery
+        issue = issue_record(data)
+        if self.vector_store is not None:
+            self.vector_store.add_jira_issue(issue)
+        if self.profiles is not None:
+            self.profiles.update_ticket(issue)
+        stats["issues_updated"] += 1
+
+
+def _signature(secret, body):
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class WebhookReceiver:
+    """
+    Local HTTP endpoint for webhook deliveries. Each POST is queued in a CoalescingQueue
+    and answered with 202 straight away; a worker thread applies due changes through
+    the IndexUpdater. A change that fails is retried on its own with backoff, up to
+    max_retries times (default HRABBIT_WEBHOOK_RETRIES), unless a newer event for the
+    same record has arrived meanwhile. GET /healthz reports the queue and update counters.
+    """
+
+    def __init__(self, updater, host="127.0.0.1", port=None, delay=None, secret=None, record_path=None,
+                 max_retries=None, log=sys.stderr):
+        self.updater = updater
+        self.host = host
+        self.port = DEFAULT_WEBHOOK_PORT if port is None else port
+        self.queue = CoalescingQueue(delay)
+        self.secret = secret if secret is not None else WEBHOOK_SECRET
+        self.record_path = record_path
+        self.max_retries = DEFAULT_WEBHOOK_RETRIES if max_retries is None else max_retries
+        self.log = log
+        # Written by the worker, read by /healthz on the HTTP threads
+        self.totals = {}
+        self._totals_lock = threading.Lock()
+        self._record_file = None
+        self._record_lock = threading.Lock()
+        self._server = None
+        self._threads = []
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self._server.server_address[1]}"
+
+    def start(self):
+        # http.server is only needed while the receiver runs
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        receiver = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status = receiver.handle(self.path, dict(self.headers), body)
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_GET(self):
+                if urlparse(self.path).path != "/healthz":
+                    self.send_error(404)
+                    return
+                body = json.dumps(receiver.stats()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        if self.record_path:
+            self._record_file = open(self.record_path, "a", encoding="utf-8")
+        self._server = ThreadingHTTPServer((self.host, self.port), WebhookHandler)
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, name="hrabbit-webhooks", daemon=True),
+            threading.Thread(target=self._work, name="hrabbit-webhook-worker", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stops accepting events, applies everything still queued and shuts down."""
+        self._server.shutdown()
+        self._server.server_close()
+        self.queue.close()
+        for thread in self._threads:
+            thread.join()
+        if self._record_file is not None:
+            self._record_file.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def handle(self, path, headers, body):
+        """Verifies, records and queues one delivery. Returns the HTTP status to answer with."""
+        if self.secret and not self._authorized(path, headers, body):
+            return 401
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400
+        if self._record_file is not None:
+            with self._record_lock:
+                self._record_file.write(json.dumps({"path": path, "payload": payload}) + "\n")
+                self._record_file.flush()
+        event = parse_event(payload, path)
+        if event is None:
+            add("webhook_events_ignored")
+            return 202
+        key, action, data = event
+        add("webhook_events", kind=key[0], action=action)
+        self.queue.put(key, action, data)
+        return 202
+
+    def _authorized(self, path, headers, body):
+        signature = headers.get("X-Hub-Signature") or headers.get("x-hub-signature")
+        if signature:
+            return hmac.compare_digest(signature, _signature(self.secret, body))
+        token = parse_qs(urlparse(path).query).get("secret", [""])[-1]
+        return hmac.compare_digest(token, self.secret)
+
+    def _work(self):
+        while True:
+            changes = self.queue.take()
+            if not changes:
+                return
+            attempts = {key: count for key, _, _, count in changes}
+            stats, failed = self.updater.apply([(key, action, data) for key, action, data, _ in changes])
+            for (key, action, data), error in failed:
+                # Only the failed change is retried, and never over a newer event for the record
+                outcome = self.queue.retry(key, action, data, attempts[key], self.max_retries)
+                add("webhook_changes_failed", outcome=outcome)
+                self._count(f"changes_{outcome}", 1)
+                print(f"Error applying {action} of {key[0]} {key[1]} ({outcome}): {error}", file=self.log)
+            for name, value in stats.items():
+                self._count(name, value)
+            print(f"Applied {len(changes)} change(s): {stats}", file=self.log)
+
+    def _count(self, name, value):
+        with self._totals_lock:
+            self.totals[name] = self.totals.get(name, 0) + value
+
+    def stats(self):
+        with self._totals_lock:
+            totals = dict(self.totals)
+        return {
+            "queued": len(self.queue),
+            "received": self.queue.received,
+            "coalesced": self.queue.coalesced,
+            **totals,
+        }
+
+
+def replay(path, url, delay=0.0, secret=None):
+    """
+    Posts the events of a JSONL file to a receiver: lines recorded with --record
+    ({"path": ..., "payload": ...}) or bare webhook payloads. Returns the number of
+    events sent.
+    """
+    secret = secret if secret is not None else WEBHOOK_SECRET
+    sent = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if "payload" in event:
+                event_path, payload = event.get("path") or "/", event["payload"]
+            else:
+                event_path, payload = "/", event
+            body = json.dumps(payload).encode("utf-8")
+            request = urllib.request.Request(url.rstrip("/") + event_path, data=body, method="POST")
+            request.add_header("Content-Type", "application/json")
+            if secret:
+                request.add_header("X-Hub-Signature", _signature(secret, body))
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            sent += 1
+            if delay:
+                time.sleep(delay)
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the local index fresh from Confluence and Jira webhooks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Receive webhooks and apply them to the index")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_WEBHOOK_PORT)
+    serve_parser.add_argument("--coalesce", type=float, default=DEFAULT_COALESCE_SECONDS,
+                              help="Seconds a page or issue must be quiet before it is updated")
+    serve_parser.add_argument("--record", help="Append every delivery to this JSONL file (for replay)")
+    serve_parser.add_argument("--index", help="Index file (default: HRABBIT_INDEX_PATH or the cache directory)")
+    serve_parser.add_argument("--profiles", help="Profile store to keep up to date (default: HRABBIT_PROFILE_PATH)")
+    serve_parser.add_argument("--embed", action="store_true", help="Also update the vector store")
+
+    replay_parser = commands.add_parser("replay", help="Post recorded events to a receiver")
+    replay_parser.add_argument("events", help="JSONL file of recorded deliveries or webhook payloads")
+    replay_parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_WEBHOOK_PORT}")
+    replay_parser.add_argument("--delay", type=float, default=0.0, help="Seconds between events")
+
+    args = parser.parse_args()
+    if args.command == "replay":
+        print(f"Sent {replay(args.events, args.url, delay=args.delay)} event(s) to {args.url}")
+        return
+
+    from dotenv import load_dotenv
+    from src.connectors.confluence_loader import ConfluenceConnector
+    from src.connectors.page_cache import PageCache
+    from src.index.profiles import ProfileStore
+    from src.index.space_index import SpaceIndex
+
+    load_dotenv()
+    confluence_url = os.getenv("CONFLUENCE_URL")
+    username = os.getenv("ATLASSIAN_USERNAME")
+    api_token = os.getenv("ATLASSIAN_API_TOKEN")
+    if not all([confluence_url, username, api_token]):
+        print("Error: Missing environment variables. Please check .env file.")
+        return
+
+    connector = ConfluenceConnector(confluence_url, username, api_token, page_cache=PageCache.from_env())
+    index = SpaceIndex(args.index or os.getenv("HRABBIT_INDEX_PATH"), site=confluence_url)
+    profiles = ProfileStore(args.profiles) if args.profiles else ProfileStore.from_env()
+    vector_store = None
+    if args.embed:
+        from src.rag.vector_store import PageVectorStore
+        vector_store = PageVectorStore()
+
+    updater = IndexUpdater(connector, index, vector_store=vector_store, profiles=profiles)
+    receiver = WebhookReceiver(updater, host=args.host, port=args.port, delay=args.coalesce, record_path=args.record)
+    with receiver:
+        print(f"Listening for webhooks on {receiver.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print("Applying queued changes and stopping...")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,28 @@
 import os
+import re
+import sys
 import argparse
 from dotenv import load_dotenv
 
+from src.batch import parse_items, run_batch, DEFAULT_BATCH_RATE, DEFAULT_BATCH_WORKERS
+from src.common import connector_kwargs, format_ticket_context
 from src.connectors.confluence_loader import ConfluenceConnector
-from src.rag.chain import RAGChain
+from src.connectors.fetch_pool import endpoint_metrics
+from src.connectors.sessions import ConnectorRegistry
+
+
+# Reuse one connector (and its HTTP connection pool) for repeated lookups
+_connector_registry = ConnectorRegistry(
+    ConfluenceConnector,
+    shared_kwargs=connector_kwargs,
+)
 
 def get_ticket_context(ticket_id: str) -> str:
     """
-    Retrieves context for a given ticket ID from Confluence.
-    Returns a formatted string with the ticket details and relevant page excerpts.
+    Retrieves context for one or more ticket IDs (separated by commas, semicolons or newlines) from Confluence.
+    The tickets are looked up concurrently and pages shared between them are fetched once.
+    Returns a formatted string with the ticket details and relevant page excerpts,
+    one section per ticket.
     """
     load_dotenv()
     
@@ -19,51 +33,84 @@ def get_ticket_context(ticket_id: str) -> str:
     if not all([confluence_url, username, api_token]):
         return "Error: Missing environment variables. Please check .env file."
 
-    # 1. Fetch Ticket Details
+    ticket_ids = [t.strip() for t in re.split(r"[,;\n]", ticket_id) if t.strip()]
+
     # Initialize Confluence Connector
-    confluence = ConfluenceConnector(confluence_url, username, api_token)
-    ticket = confluence.get_ticket_page(ticket_id)
-    
-    if not ticket:
-        return f"Failed to fetch ticket details for {ticket_id} from Confluence."
-        
-    output = []
-    output.append(f"Ticket Summary (Page Title): {ticket['summary']}")
-    
-    # 2. Formulate Search Query
-    search_query = ticket_id
-    output.append(f"Searching Confluence for: {search_query}")
-    
-    # 3. Search Confluence
-    docs = confluence.search_pages(search_query)
-    
-    # Filter: Ensure Ticket ID is actually in the content (Strict Check)
-    filtered_docs = []
-    for doc in docs:
-        if ticket_id in doc.page_content:
-            filtered_docs.append(doc)
-            
-    docs = filtered_docs
-    
-    output.append(f"Found {len(docs)} relevant pages matching {ticket_id}.")
-    for doc in docs:
-        output.append(f" - {doc.metadata['title']} ({doc.metadata['source']})")
-    
-    # Alternative: Show Extracted Output
-    output.append("\n=== Extracted Content ===\n")
-    for i, doc in enumerate(docs):
-        output.append(f"--- Document {i+1}: {doc.metadata['title']} ---")
-        # Limit content length for readability in output
-        content_preview = doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content
-        output.append(content_preview)
-        output.append("\n")
-    output.append("=========================")
-    
-    return "\n".join(output)
+    confluence = _connector_registry.get(confluence_url, username, api_token)
+
+    try:
+        contexts = confluence.get_ticket_contexts(ticket_ids)
+    except Exception as e:
+        return f"Error fetching ticket context from Confluence: {e}"
+
+    sections = []
+    for ticket_id in ticket_ids:
+        sections.append(format_ticket_context(ticket_id, contexts.get(ticket_id) or {}))
+    return "\n\n".join(sections)
+
+
+def run_batch_command(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Extract context for many tickets and/or employees, streaming JSONL results"
+    )
+    parser.add_argument("--input", default="-",
+                        help="File with one 'ticket:ID' or 'employee:Name' per line ('-' for stdin, the default)")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--checkpoint", help="Checkpoint file of finished items (default: OUTPUT.checkpoint)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BATCH_WORKERS, help="Worker threads")
+    parser.add_argument("--rate", type=float, default=DEFAULT_BATCH_RATE,
+                        help="Maximum items started per second across all workers (0 = unlimited)")
+
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    confluence_url = os.getenv("CONFLUENCE_URL")
+    username = os.getenv("ATLASSIAN_USERNAME")
+    api_token = os.getenv("ATLASSIAN_API_TOKEN")
+    if not all([confluence_url, username, api_token]):
+        print("Error: Missing environment variables. Please check .env file.", file=sys.stderr)
+        return 1
+
+    if args.input == "-":
+        items = parse_items(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            items = parse_items(f)
+
+    confluence = _connector_registry.get(confluence_url, username, api_token)
+    # Jira history is added to employee results when a Jira site is configured
+    jira_url = os.getenv("JIRA_URL")
+    jira = None
+    if jira_url:
+        from src.connectors.jira_loader import JiraConnector
+        jira = JiraConnector(jira_url, username, api_token, max_workers=args.workers)
+    try:
+        counts = run_batch(
+            items, confluence, args.output,
+            jira=jira,
+            checkpoint_path=args.checkpoint,
+            workers=args.workers,
+            rate=args.rate,
+        )
+    finally:
+        if jira is not None:
+            jira.close()
+
+    print(f"Done: {counts['done']}, failed: {counts['failed']}, skipped: {counts['skipped']}", file=sys.stderr)
+    for endpoint, stats in endpoint_metrics.snapshot().items():
+        print(f"  {endpoint}: {stats}", file=sys.stderr)
+    return 1 if counts["failed"] else 0
 
 def main():
-    parser = argparse.ArgumentParser(description="Jira-Confluence RAG System")
-    parser.add_argument("--ticket", required=True, help="Confluence Ticket ID (e.g., NB_0001)")
+    if sys.argv[1:2] == ["batch"]:
+        sys.exit(run_batch_command(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(
+        description="Jira-Confluence RAG System",
+        epilog="Use 'main.py batch --help' to process many tickets or employees from a file."
+    )
+    parser.add_argument("--ticket", required=True, help="Confluence Ticket ID (e.g., NB_0001), or several separated by commas")
     parser.add_argument("--query", help="Optional user query. (Not used in current extraction mode)")
     
     args = parser.parse_args()
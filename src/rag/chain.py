@@ -1,12 +1,27 @@
+import asyncio
+import functools
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
+from src.rag.context import ContextBuilder
+from src.rag.llm_cache import ResponseCache
+from src.telemetry import add, enabled as telemetry_enabled, span
+
+NO_CONTEXT_ANSWER = "No relevant Confluence pages found to answer this query."
+
 class RAGChain:
-    def __init__(self, model_name="gpt-4o"):
+    def __init__(self, model_name="gpt-4o", vector_store=None, k=5, context_tokens=None, response_cache=None):
+        self.model_name = model_name
+        # Optional PageVectorStore used to retrieve context when none is passed in
+        self.vector_store = vector_store
+        # ResponseCache consulted before calling the LLM (default: ResponseCache.from_env())
+        self.response_cache = response_cache if response_cache is not None else ResponseCache.from_env()
+        self.k = k
+        self.context_builder = ContextBuilder(max_tokens=context_tokens)
         self.llm = ChatOpenAI(model=model_name, temperature=0)
-        self.prompt = ChatPromptTemplate.from_template(
+        self.prompt_template = (
             """You are a helpful assistant assisting a user with a Jira ticket.
             Use the following pieces of retrieved context from Confluence pages to answer the question.
             If you don't know the answer, just say that you don't know.
@@ -21,28 +36,169 @@ class RAGChain:
             
             Answer:"""
         )
-        
-    def format_docs(self, docs):
-        return "\n\n".join(f"--- Page: {doc.metadata['title']} ---\n{doc.page_content}" for doc in docs)
-
-    def answer(self, query, ticket_details, context_docs):
-        """
-        Generates an answer based on the query, ticket details, and retrieved documents.
-        """
-        if not context_docs:
-            return "No relevant Confluence pages found to answer this query."
-
-        formatted_context = self.format_docs(context_docs)
-        
-        chain = (
+        self.prompt = ChatPromptTemplate.from_template(self.prompt_template)
+        # Compiled once and reused by every answer/stream/batch call
+        self.chain = (
             self.prompt 
             | self.llm 
             | StrOutputParser()
         )
         
-        return chain.invoke({
-            "context": formatted_context,
+    def format_docs(self, docs, question="", ticket_details=None, with_stats=False):
+        """
+        Strips markup from the documents and packs the chunks most relevant to the
+        question and ticket summary into the context token budget.
+        With with_stats, returns (context, stats) where stats reports the tokens used and
+        dropped and the chunks selected (see ContextBuilder.build).
+        """
+        with span("rag.format_docs", docs=len(docs)):
+            context, stats = self.context_builder.build(docs, question, ticket_details)
+        add("llm_context_tokens", stats["tokens_used"])
+        return (context, stats) if with_stats else context
+
+    def retrieve(self, query, ticket_details=None, k=None, **filters):
+        """
+        Retrieves the top-k chunks for the question (and ticket summary) from the vector store.
+        filters are passed through to PageVectorStore.search (space, ticket, contributor, where).
+        """
+        if self.vector_store is None:
+            return []
+        ticket_details = ticket_details or {}
+        search_text = "\n".join(part for part in (query, ticket_details.get('summary', '')) if part)
+        with span("rag.retrieve", k=k or self.k):
+            return self.vector_store.search(search_text, k=k or self.k, **filters)
+
+    def _inputs(self, query, ticket_details, context_docs=None, **filters):
+        """
+        Builds the prompt inputs and the context's packing stats, or returns (None, None)
+        if there is no context to answer from.
+        """
+        if not context_docs:
+            context_docs = self.retrieve(query, ticket_details, **filters)
+        if not context_docs:
+            return None, None
+        context, stats = self.format_docs(context_docs, query, ticket_details, with_stats=True)
+        return {
+            "context": context,
             "ticket_summary": ticket_details.get('summary', ''),
             "ticket_description": ticket_details.get('description', ''),
             "question": query
-        })
+        }, stats
+
+    def answer(self, query, ticket_details, context_docs=None, with_stats=False, **filters):
+        """
+        Generates an answer based on the query, ticket details, and retrieved documents.
+        If no documents are passed in, they are retrieved from the vector store.
+        With with_stats, returns (answer, stats) with the packing stats of this call's
+        context (None if there was no context).
+        """
+        with span("rag.answer", model=self.model_name):
+            inputs, stats = self._inputs(query, ticket_details, context_docs, **filters)
+            if inputs is None:
+                answer = NO_CONTEXT_ANSWER
+            else:
+                answer = self._cached(inputs)
+                if answer is None:
+                    with span("llm.invoke", model=self.model_name):
+                        answer = self._store(inputs, self.chain.invoke(inputs))
+        return (answer, stats) if with_stats else answer
+
+    def stream(self, query, ticket_details, context_docs=None, **filters):
+        """Same as answer(), but yields the answer text as it is generated."""
+        inputs, _ = self._inputs(query, ticket_details, context_docs, **filters)
+        if inputs is None:
+            yield NO_CONTEXT_ANSWER
+            return
+        cached = self._cached(inputs)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in self.chain.stream(inputs):
+            chunks.append(chunk)
+            yield chunk
+        self._store(inputs, "".join(chunks))
+
+    async def aanswer(self, query, ticket_details, context_docs=None, with_stats=False, **filters):
+        """Async version of answer()."""
+        with span("rag.answer", model=self.model_name):
+            inputs, stats = await self._ainputs(query, ticket_details, context_docs, **filters)
+            if inputs is None:
+                answer = NO_CONTEXT_ANSWER
+            else:
+                answer = self._cached(inputs)
+                if answer is None:
+                    with span("llm.invoke", model=self.model_name):
+                        answer = self._store(inputs, await self.chain.ainvoke(inputs))
+        return (answer, stats) if with_stats else answer
+
+    async def astream(self, query, ticket_details, context_docs=None, **filters):
+        """Async version of stream()."""
+        inputs, _ = await self._ainputs(query, ticket_details, context_docs, **filters)
+        if inputs is None:
+            yield NO_CONTEXT_ANSWER
+            return
+        cached = self._cached(inputs)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        async for chunk in self.chain.astream(inputs):
+            chunks.append(chunk)
+            yield chunk
+        self._store(inputs, "".join(chunks))
+
+    def answer_many(self, requests, max_concurrency=4, with_stats=False):
+        """
+        Answers several questions at once, running at most max_concurrency LLM calls in parallel.
+        requests is a list of dicts with 'query', 'ticket_details' and optionally 'context_docs'
+        and retrieval filters. Returns the answers in the same order, as (answer, stats)
+        pairs with with_stats.
+        """
+        answers = [NO_CONTEXT_ANSWER] * len(requests)
+        stats = [None] * len(requests)
+        positions, inputs = [], []
+        for i, request in enumerate(requests):
+            request = dict(request)
+            prompt_inputs, stats[i] = self._inputs(request.pop('query'), request.pop('ticket_details'), **request)
+            if prompt_inputs is None:
+                continue
+            cached = self._cached(prompt_inputs)
+            if cached is not None:
+                answers[i] = cached
+                continue
+            positions.append(i)
+            inputs.append(prompt_inputs)
+        if inputs:
+            with span("llm.batch", model=self.model_name, prompts=len(inputs)):
+                results = self.chain.batch(inputs, config={"max_concurrency": max_concurrency})
+            for i, prompt_inputs, result in zip(positions, inputs, results):
+                answers[i] = self._store(prompt_inputs, result)
+        return list(zip(answers, stats)) if with_stats else answers
+
+    def _cache_scope(self, inputs):
+        context = "\0".join((inputs["context"], inputs["ticket_summary"], inputs["ticket_description"]))
+        return self.response_cache.scope(self.model_name, self.prompt_template, context)
+
+    def _cached(self, inputs):
+        """Returns a cached answer for these prompt inputs, if any."""
+        if self.response_cache is None:
+            return None
+        cached = self.response_cache.get(self._cache_scope(inputs), inputs["question"])
+        add("llm_cache_hits" if cached is not None else "llm_cache_misses")
+        return cached
+
+    def _store(self, inputs, answer):
+        """Caches an answer for these prompt inputs and returns it."""
+        if telemetry_enabled():
+            add("llm_completion_tokens", self.context_builder.count_tokens(answer))
+        if self.response_cache is not None:
+            self.response_cache.put(self._cache_scope(inputs), inputs["question"], answer)
+        return answer
+
+    async def _ainputs(self, query, ticket_details, context_docs=None, **filters):
+        """Runs retrieval and context packing off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self._inputs, query, ticket_details, context_docs, **filters)
+        )
@@ -0,0 +1,127 @@
+import os
+import re
+import math
+from collections import Counter
+import tiktoken
+
+from src.connectors.storage_text import looks_like_markup, storage_to_text
+
+DEFAULT_CONTEXT_TOKENS = int(os.getenv("HRABBIT_CONTEXT_TOKENS", "6000"))
+
+_WORD = re.compile(r"\w+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def _shingles(words, size=3):
+    if len(words) < size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ContextBuilder:
+    """
+    Packs retrieved documents into a token budget for the prompt.
+    Documents are stripped of markup and split into chunks, near-identical chunks are
+    dropped, and the rest are ranked by BM25 against the question and ticket summary
+    and added best-first until the budget is used up.
+    """
+
+    def __init__(self, max_tokens=None, chunk_tokens=300, dedupe_threshold=0.85, encoding_name="cl100k_base"):
+        self.max_tokens = max_tokens or DEFAULT_CONTEXT_TOKENS
+        self.chunk_tokens = chunk_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def count_tokens(self, text):
+        return len(self.encoding.encode(text))
+
+    def build(self, docs, question="", ticket_details=None):
+        """
+        Returns (context, stats) where stats reports tokens_used, tokens_dropped,
+        chunks_selected, chunks_total and duplicates_dropped.
+        """
+        ticket_details = ticket_details or {}
+        chunks = []
+        for doc in docs:
+            title = doc.metadata.get('title', '')
+            text = doc.page_content
+            if looks_like_markup(text):
+                text = storage_to_text(text, doc.metadata.get('page_id'), doc.metadata.get('version'))
+            text = _WHITESPACE.sub(" ", text).strip()
+            for chunk in self._split(text):
+                chunks.append({"title": title, "text": chunk, "words": _words(chunk)})
+
+        query_terms = _words(" ".join([question, ticket_details.get('summary', '')]))
+        scores = self._bm25(chunks, query_terms)
+        ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+
+        selected = []
+        selected_shingles = []
+        tokens_used = 0
+        tokens_dropped = 0
+        duplicates = 0
+        for i in ranked:
+            chunk = chunks[i]
+            block = f"--- Page: {chunk['title']} ---\n{chunk['text']}"
+            tokens = self.count_tokens(block)
+            shingles = _shingles(chunk["words"])
+            if any(_jaccard(shingles, other) >= self.dedupe_threshold for other in selected_shingles):
+                duplicates += 1
+                tokens_dropped += tokens
+                continue
+            if tokens_used + tokens > self.max_tokens:
+                tokens_dropped += tokens
+                continue
+            selected.append(block)
+            selected_shingles.append(shingles)
+            tokens_used += tokens
+
+        stats = {
+            "tokens_used": tokens_used,
+            "tokens_dropped": tokens_dropped,
+            "chunks_selected": len(selected),
+            "chunks_total": len(chunks),
+            "duplicates_dropped": duplicates,
+        }
+        return "\n\n".join(selected), stats
+
+    def _split(self, text):
+        """Splits text into chunks of at most chunk_tokens tokens."""
+        tokens = self.encoding.encode(text)
+        return [
+            self.encoding.decode(tokens[start:start + self.chunk_tokens])
+            for start in range(0, len(tokens), self.chunk_tokens)
+        ]
+
+    @staticmethod
+    def _bm25(chunks, query_terms, k1=1.5, b=0.75):
+        """Scores each chunk against the query terms with Okapi BM25."""
+        if not chunks or not query_terms:
+            return [0.0] * len(chunks)
+        avg_len = sum(len(chunk["words"]) for chunk in chunks) / len(chunks) or 1.0
+        doc_freq = Counter()
+        for chunk in chunks:
+            doc_freq.update(set(chunk["words"]))
+        scores = []
+        for chunk in chunks:
+            counts = Counter(chunk["words"])
+            length = len(chunk["words"])
+            score = 0.0
+            for term in set(query_terms):
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                idf = math.log(1 + (len(chunks) - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_len))
+            scores.append(score)
+        return scores
@@ -0,0 +1,182 @@
+import os
+import math
+import time
+import array
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from src.connectors.page_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("HRABBIT_LLM_CACHE_MAX_ENTRIES", "10000"))
+DEFAULT_TTL_SECONDS = float(os.getenv("HRABBIT_LLM_CACHE_TTL", str(30 * 24 * 3600)))
+DEFAULT_SIMILARITY_THRESHOLD = float(os.getenv("HRABBIT_LLM_CACHE_SIMILARITY", "0.95"))
+# Question embeddings computed by get() and kept for the put() that follows a miss
+PENDING_EMBEDDINGS = 64
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    embedding BLOB,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_scope ON responses (scope);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+"""
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    """
+    Persistent cache of RAGChain answers.
+    The exact tier is keyed on (model, prompt hash, context hash, question). With an
+    embeddings model, a semantic tier also returns the answer to an earlier question
+    whose embedding is at least similarity_threshold similar, but only for the same
+    model, prompt and context (the "scope"), so answers never cross tickets or contexts.
+    """
+
+    def __init__(self, path=None, embeddings=None, similarity_threshold=None,
+                 max_entries=None, ttl_seconds=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "llm_cache.sqlite")
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold or DEFAULT_SIMILARITY_THRESHOLD
+        self.max_entries = max_entries or DEFAULT_MAX_ENTRIES
+        self.ttl_seconds = DEFAULT_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._pending_embeddings = OrderedDict()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Returns the default cache, or None when disabled with HRABBIT_LLM_CACHE=0.
+        HRABBIT_LLM_CACHE_SEMANTIC=1 adds the semantic tier, using OpenAI embeddings.
+        """
+        if os.getenv("HRABBIT_LLM_CACHE", "1").lower() in ("0", "false", "no", "off"):
+            return None
+        embeddings = None
+        if os.getenv("HRABBIT_LLM_CACHE_SEMANTIC", "0").lower() in ("1", "true", "yes", "on"):
+            # The embeddings client is only needed for the semantic tier
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings()
+        try:
+            return cls(embeddings=embeddings)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error opening LLM response cache, continuing without it: {e}")
+            return None
+
+    @staticmethod
+    def scope(model, prompt, context):
+        """Hashes everything an answer depends on apart from the question itself."""
+        return _sha256(model, _sha256(prompt), _sha256(context))
+
+    def get(self, scope, question):
+        """Returns a cached answer for the question in this scope, or None."""
+        now = time.time()
+        key = _sha256(scope, question)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is not None:
+                self._touch(key, now)
+                self.exact_hits += 1
+                return row[0]
+
+        if self.embeddings is not None:
+            query_embedding = array.array("f", self.embeddings.embed_query(question))
+            with self._lock:
+                candidates = self._db.execute(
+                    "SELECT key, answer, embedding FROM responses "
+                    "WHERE scope = ? AND embedding IS NOT NULL AND created_at >= ?",
+                    (scope, now - self.ttl_seconds),
+                ).fetchall()
+            best_key, best_answer, best_score = None, None, 0.0
+            for candidate_key, answer, blob in candidates:
+                score = _cosine(query_embedding, array.array("f", blob))
+                if score > best_score:
+                    best_key, best_answer, best_score = candidate_key, answer, score
+            if best_key is not None and best_score >= self.similarity_threshold:
+                with self._lock:
+                    self._touch(best_key, now)
+                    self.semantic_hits += 1
+                return best_answer
+
+        with self._lock:
+            self.misses += 1
+            if self.embeddings is not None:
+                # The caller is about to compute the answer and put() it; spare it a second embedding call
+                self._pending_embeddings[(scope, question)] = query_embedding
+                while len(self._pending_embeddings) > PENDING_EMBEDDINGS:
+                    self._pending_embeddings.popitem(last=False)
+        return None
+
+    def put(self, scope, question, answer):
+        """
+        Stores an answer and evicts expired and least recently used entries. The question's
+        embedding is taken from the get() that missed on it, if there was one.
+        """
+        now = time.time()
+        embedding = None
+        if self.embeddings is not None:
+            with self._lock:
+                embedding = self._pending_embeddings.pop((scope, question), None)
+            if embedding is None:
+                embedding = array.array("f", self.embeddings.embed_query(question))
+            embedding = embedding.tobytes()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, scope, question, answer, embedding, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_sha256(scope, question), scope, question, answer, embedding, now, now),
+            )
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _touch(self, key, now):
+        self._db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._db.commit()
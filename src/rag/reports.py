@@ -0,0 +1,328 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import argparse
+import threading
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
+
+from src.connectors.documents import PageDocument, page_metadata
+from src.connectors.page_cache import DEFAULT_CACHE_DIR
+from src.telemetry import add, span
+
+# LLM calls (page summaries and reports together) in flight at once
+DEFAULT_REPORT_CONCURRENCY = int(os.getenv("HRABBIT_REPORT_CONCURRENCY", "4"))
+
+# Pages per employee that go into a report, and tokens of each page sent to be summarized
+DEFAULT_REPORT_PAGES = 8
+DEFAULT_SUMMARY_TOKENS = 1500
+
+SUMMARY_PROMPT = (
+    """Summarize the following Confluence page for an offboarding review in at most 5 bullets.
+    Keep names, systems, locations and procedures; note anything that looks undocumented or unclear.
+
+    Page: {title}
+
+    {text}
+
+    Summary:"""
+)
+
+REPORT_QUESTION = (
+    """Using ONLY the context, produce this report:
+ANALYSIS REPORT FOR: {employee}
+SECTION A: DOCUMENT SUMMARY (max 3 bullets)
+- Key takeaways from the documents.
+SECTION B: GAP ANALYSIS
+- What is missing for a complete offboarding.
+- 2-3 concrete risks (e.g. undocumented passwords, unclear folder locations, vague or missing handoff steps).
+SECTION C: EXIT INTERVIEW QUESTIONS
+- 3 focused questions to fill the gaps identified in Section B."""
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS page_summaries (
+    page_id TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    scope TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (page_id, version, scope)
+);
+CREATE TABLE IF NOT EXISTS reports (
+    employee_key TEXT PRIMARY KEY,
+    employee TEXT NOT NULL,
+    inputs_hash TEXT NOT NULL,
+    report TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def _sha256(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ReportStore:
+    """
+    SQLite store of page summaries, keyed by page id, version and the model/prompt that
+    wrote them, and of the latest gap-analysis report per employee together with a
+    hash of everything it was generated from.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "reports.sqlite")
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def get_summary(self, page_id, version, scope):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT summary FROM page_summaries WHERE page_id = ? AND version = ? AND scope = ?",
+                (str(page_id), version, scope),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_summary(self, page_id, version, scope, summary):
+        with self._lock:
+            # Summaries of older versions of the page are never read again
+            self._db.execute(
+                "DELETE FROM page_summaries WHERE page_id = ? AND scope = ? AND version < ?",
+                (str(page_id), scope, version),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO page_summaries (page_id, version, scope, summary, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (str(page_id), version, scope, summary, time.time()),
+            )
+            self._db.commit()
+
+    def get_report(self, employee):
+        """Returns {employee, inputs_hash, report, created_at} for an employee, or None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT employee, inputs_hash, report, created_at FROM reports WHERE employee_key = ?",
+                (employee.lower(),),
+            ).fetchone()
+        if row is None:
+            return None
+        name, inputs_hash, report, created_at = row
+        return {"employee": name, "inputs_hash": inputs_hash, "report": report, "created_at": created_at}
+
+    def put_report(self, employee, inputs_hash, report):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO reports (employee_key, employee, inputs_hash, report, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (employee.lower(), employee, inputs_hash, report, time.time()),
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class ReportEngine:
+    """
+    Generates Section A/B/C gap-analysis reports for a whole team with a RAGChain.
+
+    Each employee's report is built from their precomputed profile (src.index.profiles):
+    the pages they own (or, failing that, pages mentioning them) are summarized and the
+    summaries plus the employee's snippets are the chain's context. Summaries are cached
+    by page version and shared between employees, so a page several people worked on is
+    summarized once. A report is only regenerated when its inputs (page versions,
+    snippets, tickets, model or prompt) changed since the stored one.
+    At most max_concurrency LLM calls run at once.
+    """
+
+    def __init__(self, chain, index, profiles, store=None, max_concurrency=None,
+                 max_pages=DEFAULT_REPORT_PAGES, summary_tokens=DEFAULT_SUMMARY_TOKENS):
+        self.chain = chain
+        self.index = index
+        self.profiles = profiles
+        self.store = store or ReportStore()
+        self.max_concurrency = max_concurrency or DEFAULT_REPORT_CONCURRENCY
+        self.max_pages = max_pages
+        self.summary_tokens = summary_tokens
+        self.summary_chain = ChatPromptTemplate.from_template(SUMMARY_PROMPT) | chain.llm | StrOutputParser()
+        self._summary_scope = _sha256(chain.model_name, SUMMARY_PROMPT, summary_tokens)
+        self._report_scope = _sha256(chain.model_name, chain.prompt_template, REPORT_QUESTION)
+        self._semaphore = None
+        self._summaries = {}
+        self.stats = {}
+
+    def generate(self, employees=None, force=False):
+        """Synchronous wrapper around agenerate()."""
+        return asyncio.run(self.agenerate(employees, force=force))
+
+    async def agenerate(self, employees=None, force=False):
+        """
+        Generates the reports of the given employees (default: every profiled employee).
+        With force, reports are regenerated even if they are current.
+
+        Returns a dict mapping each employee to {"status": ..., "report": ...}, where status
+        is "generated", "current" (skipped, inputs unchanged), "no_profile", "no_pages" or
+        "failed" (with an "error" instead of a report).
+        """
+        employees = list(dict.fromkeys(employees or self.profiles.employees()))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._summaries = {}
+        self.stats = {"summaries_generated": 0, "summaries_cached": 0}
+        with span("reports.generate", employees=len(employees)):
+            results = await asyncio.gather(
+                *(self._report(employee, force) for employee in employees), return_exceptions=True
+            )
+        reports = {}
+        for employee, result in zip(employees, results):
+            if isinstance(result, Exception):
+                result = {"status": "failed", "error": f"{type(result).__name__}: {result}"}
+            reports[employee] = result
+            add("reports", status=result["status"])
+        return reports
+
+    def _pages(self, profile):
+        """Returns the indexed pages (with text and version) the employee's report is based on."""
+        entries = profile["owned_pages"] or profile["mentions"]
+        pages = []
+        for entry in entries[:self.max_pages]:
+            page = self.index.get_page(entry["page_id"])
+            if page is not None:
+                pages.append({**page, "snippets": entry["snippets"]})
+        return pages
+
+    async def _report(self, employee, force):
+        profile = self.profiles.get_profile(employee)
+        if profile is None:
+            return {"status": "no_profile"}
+        pages = self._pages(profile)
+        if not pages:
+            return {"status": "no_pages"}
+
+        tickets = [(ticket["key"], ticket["status"], ticket["updated"]) for ticket in profile["tickets"]]
+        inputs_hash = _sha256(
+            self._report_scope,
+            profile["employee"],
+            json.dumps([(page["page_id"], page["version"], page["snippets"]) for page in pages]),
+            json.dumps(tickets),
+        )
+        stored = self.store.get_report(profile["employee"])
+        if stored is not None and stored["inputs_hash"] == inputs_hash and not force:
+            return {"status": "current", "report": stored["report"]}
+
+        summaries = await asyncio.gather(*(self._summary(page) for page in pages))
+        docs = []
+        for page, summary in zip(pages, summaries):
+            mentions = "\n".join(f"- {snippet}" for snippet in page["snippets"])
+            docs.append(PageDocument(
+                page_content=f"{summary}\n\nMentions of {profile['employee']}:\n{mentions}",
+                metadata=page_metadata(page["page_id"], page["title"], page["source"]),
+            ))
+        ticket_lines = [
+            f"{ticket['key']}: {ticket['summary'] or ''} ({ticket['status'] or ticket['role']})"
+            for ticket in profile["tickets"]
+        ]
+        ticket_details = {
+            "summary": f"Offboarding review for {profile['employee']}",
+            "description": "\n".join(
+                [f"Last activity: {profile['last_touched'] or 'unknown'}", "Related tickets:", *ticket_lines]
+            ),
+        }
+        async with self._semaphore:
+            with span("reports.employee", pages=len(pages)):
+                report = await self.chain.aanswer(
+                    REPORT_QUESTION.format(employee=profile["employee"]), ticket_details, context_docs=docs
+                )
+        self.store.put_report(profile["employee"], inputs_hash, report)
+        return {"status": "generated", "report": report}
+
+    def _summary(self, page):
+        """
+        Returns an awaitable summary of an indexed page. Employees sharing a page
+        share one in-flight summary task.
+        """
+        key = (page["page_id"], page["version"])
+        task = self._summaries.get(key)
+        if task is None:
+            task = self._summaries[key] = asyncio.ensure_future(self._summarize(page))
+        return task
+
+    async def _summarize(self, page):
+        cached = self.store.get_summary(page["page_id"], page["version"], self._summary_scope)
+        if cached is not None:
+            self.stats["summaries_cached"] += 1
+            return cached
+        encoding = self.chain.context_builder.encoding
+        text = encoding.decode(encoding.encode(page["text"])[:self.summary_tokens])
+        async with self._semaphore:
+            with span("reports.summarize", page_id=page["page_id"]):
+                summary = await self.summary_chain.ainvoke({"title": page["title"], "text": text})
+        self.store.put_summary(page["page_id"], page["version"], self._summary_scope, summary)
+        self.stats["summaries_generated"] += 1
+        return summary
+
+
+def _report_filename(employee):
+    return re.sub(r"[^\w.-]+", "_", employee).strip("_") + ".md"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate gap-analysis reports for a team from precomputed profiles")
+    parser.add_argument("--employee", action="append", default=[],
+                        help="Employee to report on (repeatable; default: every profiled employee)")
+    parser.add_argument("--output-dir", help="Also write each report to DIR/<employee>.md")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_REPORT_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--force", action="store_true", help="Regenerate reports even if they are current")
+    parser.add_argument("--model", default="gpt-4o", help="Chat model used for summaries and reports")
+    parser.add_argument("--index", help="Index file (default: HRABBIT_INDEX_PATH or the cache directory)")
+    parser.add_argument("--profiles", help="Profile store (default: HRABBIT_PROFILE_PATH or the cache directory)")
+    parser.add_argument("--reports", help="Report store (default: HRABBIT_REPORT_PATH or the cache directory)")
+
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from src.index.profiles import ProfileStore
+    from src.index.space_index import SpaceIndex
+    from src.rag.chain import RAGChain
+
+    load_dotenv()
+    index = SpaceIndex(args.index or os.getenv("HRABBIT_INDEX_PATH"))
+    profiles = ProfileStore(args.profiles or os.getenv("HRABBIT_PROFILE_PATH"))
+    if not profiles.employees():
+        print("Error: No profiles found. Run src.index.profiles first.")
+        return
+
+    engine = ReportEngine(
+        RAGChain(model_name=args.model),
+        index,
+        profiles,
+        store=ReportStore(args.reports or os.getenv("HRABBIT_REPORT_PATH")),
+        max_concurrency=args.concurrency,
+    )
+    reports = engine.generate(args.employee or None, force=args.force)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for employee, result in reports.items():
+        print(f"{employee}: {result['status']}" + (f" ({result['error']})" if "error" in result else ""))
+        if args.output_dir and "report" in result:
+            with open(os.path.join(args.output_dir, _report_filename(employee)), "w", encoding="utf-8") as f:
+                f.write(result["report"] + "\n")
+    print(f"Page summaries: {engine.stats['summaries_generated']} generated, "
+          f"{engine.stats['summaries_cached']} reused from cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import hashlib
+import chromadb
+import tiktoken
+from langchain_core.documents import Document
+from langchain_openai import OpenAIEmbeddings
+
+from src.connectors.page_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_CHUNK_TOKENS = int(os.getenv("HRABBIT_CHUNK_TOKENS", "400"))
+DEFAULT_CHUNK_OVERLAP = int(os.getenv("HRABBIT_CHUNK_OVERLAP", "50"))
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageVectorStore:
+    """
+    Persistent Chroma collection of token-sized chunks of Confluence pages and Jira issues.
+    Each chunk stores the content hash and source version, so re-adding a document only
+    embeds the chunks that actually changed.
+    """
+
+    def __init__(self, path=None, collection_name="hrabbit", embeddings=None,
+                 chunk_tokens=None, chunk_overlap=None, encoding_name="cl100k_base"):
+        self.path = path or os.getenv("HRABBIT_VECTOR_PATH", os.path.join(DEFAULT_CACHE_DIR, "chroma"))
+        self.client = chromadb.PersistentClient(path=self.path)
+        self.collection = self.client.get_or_create_collection(
+            collection_name, metadata={"hnsw:space": "cosine"}
+        )
+        self.embeddings = embeddings or OpenAIEmbeddings()
+        self.chunk_tokens = chunk_tokens or DEFAULT_CHUNK_TOKENS
+        self.chunk_overlap = DEFAULT_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.encoding = tiktoken.get_encoding(encoding_name)
+
+    def chunk_text(self, text):
+        """Splits text into windows of chunk_tokens tokens overlapping by chunk_overlap."""
+        tokens = self.encoding.encode(text)
+        if not tokens:
+            return []
+        step = max(1, self.chunk_tokens - self.chunk_overlap)
+        chunks = []
+        for start in range(0, len(tokens), step):
+            chunks.append(self.encoding.decode(tokens[start:start + self.chunk_tokens]))
+            if start + self.chunk_tokens >= len(tokens):
+                break
+        return chunks
+
+    def upsert_document(self, doc_id, text, metadata=None, version=None):
+        """
+        Chunks and stores a document (plain text, not storage HTML).
+        Only chunks whose content hash changed are embedded; chunks left over from a
+        longer previous version are deleted. Returns the number of chunks embedded.
+        """
+        doc_id = str(doc_id)
+        metadata = {k: v for k, v in (metadata or {}).items() if v is not None}
+        doc_hash = _hash(text)
+
+        existing = self.collection.get(where={"doc_id": doc_id}, include=["metadatas"])
+        existing_hashes = {
+            chunk_id: meta.get("chunk_hash") for chunk_id, meta in zip(existing["ids"], existing["metadatas"])
+        }
+        if existing["metadatas"] and all(
+            meta.get("doc_hash") == doc_hash and meta.get("version") == version for meta in existing["metadatas"]
+        ):
+            return 0
+
+        chunks = self.chunk_text(text)
+        ids, texts, metadatas = [], [], []
+        unchanged_ids, unchanged_metadatas = [], []
+        for i, chunk in enumerate(chunks):
+            chunk_id = f"{doc_id}:{i}"
+            chunk_hash = _hash(chunk)
+            chunk_metadata = dict(
+                metadata, doc_id=doc_id, chunk=i, chunk_hash=chunk_hash, doc_hash=doc_hash
+            )
+            if version is not None:
+                chunk_metadata["version"] = version
+            if existing_hashes.get(chunk_id) == chunk_hash:
+                unchanged_ids.append(chunk_id)
+                unchanged_metadatas.append(chunk_metadata)
+                continue
+            ids.append(chunk_id)
+            texts.append(chunk)
+            metadatas.append(chunk_metadata)
+
+        if unchanged_ids:
+            # Same text as before: refresh the metadata without re-embedding
+            self.collection.update(ids=unchanged_ids, metadatas=unchanged_metadatas)
+        if ids:
+            self.collection.upsert(
+                ids=ids,
+                documents=texts,
+                metadatas=metadatas,
+                embeddings=self.embeddings.embed_documents(texts),
+            )
+
+        stale = [chunk_id for chunk_id in existing_hashes if int(chunk_id.rsplit(":", 1)[1]) >= len(chunks)]
+        if stale:
+            self.collection.delete(ids=stale)
+        return len(ids)
+
+    def add_confluence_page(self, page_id, title, text, source=None, space_key=None, version=None):
+        """Stores a Confluence page's stripped text."""
+        return self.upsert_document(
+            page_id,
+            f"{title}\n\n{text}",
+            metadata={"kind": "confluence", "page_id": str(page_id), "title": title,
+                      "source": source, "space_key": space_key},
+            version=version,
+        )
+
+    def add_jira_issue(self, issue):
+        """Stores a Jira issue as returned by JiraConnector.get_ticket_details."""
+        return self.upsert_document(
+            f"jira:{issue['key']}",
+            f"{issue['key']}: {issue.get('summary', '')}\n\n{issue.get('description') or ''}",
+            metadata={"kind": "jira", "ticket_key": issue["key"], "title": issue.get("summary", "")},
+            version=issue.get("updated"),
+        )
+
+    def remove_document(self, doc_id):
+        self.collection.delete(where={"doc_id": str(doc_id)})
+
+    def search(self, query, k=5, where=None, space=None, ticket=None, contributor=None):
+        """
+        Returns the top-k chunks for a query as Documents (best first), with the chunk
+        metadata plus a 'score' (cosine similarity).
+        space filters on the page's space key; ticket and contributor only keep chunks
+        whose text mentions the given ticket key or person.
+        """
+        filters = [dict(where)] if where else []
+        if space:
+            filters.append({"space_key": space})
+        where = filters[0] if len(filters) == 1 else ({"$and": filters} if filters else None)
+
+        mentions = [{"$contains": term} for term in (ticket, contributor) if term]
+        where_document = mentions[0] if len(mentions) == 1 else ({"$and": mentions} if mentions else None)
+
+        results = self.collection.query(
+            query_embeddings=[self.embeddings.embed_query(query)],
+            n_results=k,
+            where=where,
+            where_document=where_document,
+            include=["documents", "metadatas", "distances"],
+        )
+        documents = []
+        for text, metadata, distance in zip(results["documents"][0], results["metadatas"][0], results["distances"][0]):
+            documents.append(Document(page_content=text, metadata=dict(metadata, score=1.0 - distance)))
+        return documents
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import atexit
+import secrets
+import functools
+import threading
+import contextvars
+
+# Spans are appended to this file as JSON lines (OpenTelemetry field names)
+TRACE_FILE = os.getenv("HRABBIT_TRACE_FILE")
+# Prometheus text exposition written here at exit
+METRICS_FILE = os.getenv("HRABBIT_METRICS_FILE")
+# Port serving /metrics in Prometheus text format (0 = off)
+METRICS_PORT = int(os.getenv("HRABBIT_METRICS_PORT", "0"))
+
+_enabled = False
+# HRABBIT_METRICS_PORT is only bound once the process records its first span, so that
+# importing this module never opens a socket (or fails on a port another process holds)
+_pending_metrics_port = None
+_metrics_lock = threading.Lock()
+_current_span = contextvars.ContextVar("hrabbit_current_span", default=None)
+
+
+class _NoopSpan:
+    """Returned by span() while instrumentation is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, value=1):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """
+    A timed operation. Nested spans share the trace id of the span they were started in
+    (across threads too, for work submitted through fetch_ordered).
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "attributes",
+                 "start_ns", "end_ns", "error", "_token")
+
+    def __init__(self, name, attributes):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.error = None
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end_ns = time.time_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _collector.finish(self)
+        return False
+
+    @property
+    def duration(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def add(self, key, value=1):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+        }
+
+
+class _Collector:
+    """Aggregates finished spans and counters, and fans spans out to the trace file and hooks."""
+
+    def __init__(self):
+        self.counters = {}
+        self.spans = {}
+        self.hooks = []
+        self.sources = []
+        self._trace_file = None
+        self._lock = threading.Lock()
+
+    def open_trace_file(self, path):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+            self._trace_file = open(path, "a", encoding="utf-8") if path else None
+
+    def finish(self, span):
+        with self._lock:
+            stats = self.spans.get(span.name)
+            if stats is None:
+                stats = self.spans[span.name] = {"count": 0, "errors": 0, "sum": 0.0, "max": 0.0}
+            seconds = span.duration
+            stats["count"] += 1
+            stats["sum"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            if span.error:
+                stats["errors"] += 1
+            if self._trace_file is not None:
+                self._trace_file.write(json.dumps(span.to_dict(), default=str) + "\n")
+                self._trace_file.flush()
+            hooks = list(self.hooks)
+        for hook in hooks:
+            hook(span)
+
+    def add(self, metric, value, labels):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            spans = sorted(self.spans.items())
+            sources = list(self.sources)
+        for (metric, labels), value in counters:
+            lines.append(f"hrabbit_{metric}_total{_labels(dict(labels))} {value}")
+        for name, stats in spans:
+            labels = _labels({"span": name})
+            lines.append(f"hrabbit_span_duration_seconds_count{labels} {stats['count']}")
+            lines.append(f"hrabbit_span_duration_seconds_sum{labels} {stats['sum']:.6f}")
+            lines.append(f"hrabbit_span_duration_seconds_max{labels} {stats['max']:.6f}")
+            lines.append(f"hrabbit_span_errors_total{labels} {stats['errors']}")
+        for source in sources:
+            for metric, labels, value in source():
+                lines.append(f"hrabbit_{metric}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.spans.clear()
+
+
+_collector = _Collector()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def enabled():
+    return _enabled
+
+
+def enable(trace_file=None, metrics_file=None, metrics_port=None):
+    """
+    Turns instrumentation on. Spans go to trace_file (JSON lines), Prometheus text is
+    written to metrics_file at exit and served on metrics_port, each when given.
+    """
+    global _enabled
+    _enabled = True
+    if trace_file:
+        _collector.open_trace_file(trace_file)
+    if metrics_file:
+        atexit.register(write_metrics, metrics_file)
+    if metrics_port:
+        _start_metrics_endpoint(metrics_port)
+
+
+def _start_metrics_endpoint(port):
+    """Starts serve_metrics on port, logging instead of raising if the port can't be bound."""
+    try:
+        return serve_metrics(port)
+    except OSError as e:
+        print(f"Error serving metrics on port {port}, continuing without the endpoint: {e}", file=sys.stderr)
+        return None
+
+
+def _start_pending_metrics_endpoint():
+    global _pending_metrics_port
+    with _metrics_lock:
+        port, _pending_metrics_port = _pending_metrics_port, None
+    if port:
+        _start_metrics_endpoint(port)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    _collector.open_trace_file(None)
+
+
+def span(name, **attributes):
+    """
+    Context manager timing an operation:
+
+        with span("confluence.search", query=query) as s:
+            ...
+            s.set("results", len(docs))
+
+    While instrumentation is disabled this returns a shared no-op object.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    if _pending_metrics_port:
+        _start_pending_metrics_endpoint()
+    return Span(name, attributes)
+
+
+def traced(name=None):
+    """Decorator running the function inside a span (named after the function by default)."""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add(metric, value=1, **labels):
+    """Increments a counter (exported as hrabbit_<metric>_total) and the current span's attribute."""
+    if not _enabled:
+        return
+    _collector.add(metric, value, labels)
+    current = _current_span.get()
+    if current is not None:
+        current.add(metric, value)
+
+
+def add_hook(hook):
+    """Registers hook(span), called as each span finishes, e.g. to forward spans to an OpenTelemetry SDK."""
+    with _collector._lock:
+        _collector.hooks.append(hook)
+
+
+def add_metrics_source(source):
+    """Registers source(), returning (metric, labels, value) tuples appended to the Prometheus output."""
+    with _collector._lock:
+        _collector.sources.append(source)
+
+
+def bind_context(func):
+    """Wraps func so it runs in a copy of the caller's context, keeping the current span across threads."""
+    if not _enabled:
+        return func
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def instrument_session(session, service):
+    """Counts the bytes of every HTTP response received through a requests session."""
+    if not _enabled:
+        return
+
+    def count_bytes(response, *args, **kwargs):
+        add("bytes_downloaded", len(response.content), service=service)
+
+    session.hooks.setdefault("response", []).append(count_bytes)
+
+
+def prometheus_text():
+    return _collector.prometheus_text()
+
+
+def write_metrics(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+
+
+def reset():
+    """Clears the collected counters and span statistics."""
+    _collector.reset()
+
+
+def serve_metrics(port, host="127.0.0.1"):
+    """Serves /metrics on a background thread. Returns the server."""
+    # http.server is only needed when the endpoint is turned on
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="hrabbit-metrics", daemon=True).start()
+    return server
+
+
+if TRACE_FILE or METRICS_FILE or METRICS_PORT:
+    enable(trace_file=TRACE_FILE, metrics_file=METRICS_FILE)
+    _pending_metrics_port = METRICS_PORT or None
@@ -1,16 +1,18 @@
 import os
-import base64
+import json
 import re
-import html
-from dotenv import load_dotenv
-from atlassian import Confluence
-from langchain_core.documents import Document
+import time
 from ibm_watsonx_orchestrate.agent_builder.tools import tool, ToolPermission
 from ibm_watsonx_orchestrate.agent_builder.connections import (
     ConnectionType,
     ExpectedCredentials,
 )
-from ibm_watsonx_orchestrate.run import connections
+
+from src.common import connector_kwargs, format_ticket_context, preview
+from src.connectors.confluence_loader import ConfluenceConnector
+from src.connectors.sessions import ConnectorRegistry
+from src.index.profiles import ProfileStore
+from src.telemetry import traced
 
 
 def get_confluence_connection():
@@ -18,6 +20,7 @@ def get_confluence_connection():
     try:
         # Get credentials from orchestrate connection (required)
         try:
+            from ibm_watsonx_orchestrate.run import connections
             conn = connections.key_value("confluence_creds")
             confluence_url = conn.get("CONFLUENCE_URL")
             username = conn.get("ATLASSIAN_USERNAME")
@@ -51,198 +54,138 @@ def get_confluence_connection():
     except Exception as e:
         raise Exception(f"Failed to get Confluence connection: {str(e)}")
 
-# --- Confluence Connector Class ---
-class ConfluenceConnector:
-    def __init__(self, url, username, api_token):
-        self.confluence = Confluence(
-            url=url,
-            username=username,
-            password=api_token,
-            cloud=True
-        )
-        
-        # Explicitly add Authorization header as requested
-        auth_str = f"{username}:{api_token}"
-        encoded_auth = base64.b64encode(auth_str.encode()).decode()
-        self.confluence.session.headers.update({"Authorization": f"Basic {encoded_auth}"})
-
-    def search_pages(self, query, limit=5, exclude_ids=None):
-        """
-        Searches for pages in Confluence using CQL (Confluence Query Language).
-        Returns a list of LangChain Documents.
-        """
-        try:
-            # Using the simple search API which might be easier for keywords
-            # But CQL is more powerful. Let's stick to CQL.
-            cql = f'siteSearch ~ "{query}" AND type = "page"'
-            
-            if exclude_ids:
-                ids_str = ", ".join([str(pid) for pid in exclude_ids])
-                cql += f' AND id NOT IN ({ids_str})'
-                
-            results = self.confluence.cql(cql, limit=limit)
-            
-            documents = []
-            for result in results.get('results', []):
-                page_id = result['content']['id']
-                title = result['content']['title']
-                # Fetch full content
-                page_content = self.confluence.get_page_by_id(page_id, expand='body.storage')
-                body = page_content.get('body', {}).get('storage', {}).get('value', '')
-                
-                doc = Document(
-                    page_content=body,
-                    metadata={
-                        "title": title,
-                        "source": result['content']['_links']['webui'],
-                        "page_id": page_id
-                    }
-                )
-                documents.append(doc)
-                
-            return documents
 
-        except Exception as e:
-            print(f"Error searching Confluence: {e}")
-            return []
-
-    def get_ticket_page(self, ticket_id):
-        """
-        Searches for a page containing the ticket_id and returns its details.
-        Assumes the page Title is the Summary and Body is the Description.
-        """
-        try:
-            # Search for the page containing the ticket ID
-            cql = f'text ~ "{ticket_id}" AND type = "page"'
-            results = self.confluence.cql(cql, limit=1)
-            
-            if not results.get('results'):
-                print(f"No page found for ticket ID: {ticket_id}")
-                return None
-                
-            page = results['results'][0]
-            page_id = page['content']['id']
-            title = page['content']['title']
-            
-            # Fetch full content
-            page_content = self.confluence.get_page_by_id(page_id, expand='body.storage')
-            body = page_content.get('body', {}).get('storage', {}).get('value', '')
-            
-            return {
-                "key": ticket_id,
-                "summary": title,
-                "description": body,
-                "page_id": page_id
-            }
-            
-        except Exception as e:
-            print(f"Error fetching ticket page for {ticket_id}: {e}")
-            return None
+# Connectors (and their keep-alive HTTP sessions) are shared across tool invocations,
+# as are the on-disk page cache and the synced search index (if any)
+_connector_registry = ConnectorRegistry(
+    ConfluenceConnector,
+    shared_kwargs=connector_kwargs,
+)
 
-    def search_employee_contributor(self, identifier: str, limit: int = 20, context_chars: int = 120):
-        """
-        Search Confluence pages for occurrences of an employee name or email (identifier).
 
-        Returns a list of dicts with: page_id, title, source, matches (snippets around each occurrence).
-        """
-        try:
-            cql = f'siteSearch ~ "{identifier}" AND type = "page"'
-            results = self.confluence.cql(cql, limit=limit)
-
-            matches = []
-            search_lower = identifier.lower()
-
-            for result in results.get('results', []):
-                page_id = result['content']['id']
-                title = result['content']['title']
-
-                page_content = self.confluence.get_page_by_id(page_id, expand='body.storage')
-                body = page_content.get('body', {}).get('storage', {}).get('value', '')
-
-                # Strip simple HTML tags for snippet extraction and unescape HTML entities
-                text = re.sub(r'<[^>]+>', ' ', body)
-                text = html.unescape(text)
-
-                lower = text.lower()
-                start = 0
-                found_snips = []
-
-                while True:
-                    pos = lower.find(search_lower, start)
-                    if pos == -1:
-                        break
-                    s = max(0, pos - context_chars)
-                    e = min(len(text), pos + len(identifier) + context_chars)
-                    snippet = text[s:e].strip()
-                    found_snips.append(snippet)
-                    start = pos + len(identifier)
-
-                if found_snips:
-                    matches.append({
-                        "page_id": page_id,
-                        "title": title,
-                        "source": result['content']['_links']['webui'],
-                        "matches": found_snips,
-                    })
-
-            return matches
+def get_confluence_connector():
+    """Returns the shared ConfluenceConnector for the current 'confluence_creds' credentials"""
+    creds = get_confluence_connection()
+    return _connector_registry.get(creds["url"], creds["username"], creds["api_token"])
+
+
+_profile_store = None
+
+
+def get_profile_store():
+    """Returns the precomputed employee profile store, or None until src.index.profiles has been run."""
+    global _profile_store
+    if _profile_store is None:
+        _profile_store = ProfileStore.from_env()
+    return _profile_store
+
+
+# --- Output Helpers ---
+# Default tool output: "markdown", or "json" for compact structured results with
+# whitespace-collapsed text and only the requested fields, which costs the agent far
+# fewer prompt tokens on every step that re-reads them
+TOOL_OUTPUT = os.getenv("HRABBIT_TOOL_OUTPUT", "markdown")
+
+PAGE_FIELDS = ("id", "title", "url", "text")
+TICKET_FIELDS = ("key", "summary", "id", "text")
+MATCH_FIELDS = ("id", "title", "url", "snippets")
+PROFILE_PAGE_FIELDS = ("id", "title", "url", "modified", "snippets")
+
+
+def _is_json(output_format):
+    return (output_format or TOOL_OUTPUT).strip().lower() == "json"
+
+
+def _dump(payload):
+    """Serializes a JSON tool result without whitespace or ASCII escaping."""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _error(e, as_json):
+    return _dump({"error": str(e)}) if as_json else f"Error: {str(e)}"
+
+
+def _compact(text, max_chars):
+    """Collapses whitespace and cuts text to max_chars (0 for no limit). Returns (text, truncated)."""
+    text = " ".join(str(text).split())
+    if max_chars and len(text) > max_chars:
+        return text[:max_chars].rstrip(), True
+    return text, False
+
+
+def _fields(fields, allowed):
+    """Parses a comma-separated fields= argument into the allowed fields it names; empty means all."""
+    requested = {field.strip().lower() for field in (fields or "").split(",") if field.strip()}
+    return [field for field in allowed if field in requested] if requested else list(allowed)
+
+
+def _record(values, fields, max_chars):
+    """
+    Builds one JSON result from {field: value}, keeping only fields. Text is compacted
+    and cut to max_chars, with "truncated": true when it was cut; snippets are compacted
+    the same way.
+    """
+    record = {}
+    for field in fields:
+        value = values.get(field)
+        if field == "text":
+            record["text"], truncated = _compact(value or "", max_chars)
+            if truncated:
+                record["truncated"] = True
+        elif field == "snippets":
+            record["snippets"] = [_compact(snip, max_chars)[0] for snip in value or []]
+        elif value is not None:
+            record[field] = value
+    return record
+
+
+def _page_values(metadata, text=None, snippets=None):
+    """Maps page metadata onto the JSON field names. The id is the handle for confluence_get_page."""
+    return {"id": metadata["page_id"], "title": metadata["title"], "url": metadata["source"],
+            "text": text, "snippets": snippets}
 
-        except Exception as e:
-            print(f"Error searching for contributor {identifier}: {e}")
-            return []
 
 # --- Helper Function ---
-def get_ticket_context(ticket_id: str) -> str:
+def get_ticket_context(ticket_id: str, output_format: str = "", fields: str = "", max_chars: int = 500) -> str:
     """
-    Retrieves context for a given ticket ID from Confluence.
-    Returns a formatted string with the ticket details and relevant page excerpts.
+    Retrieves context for one or more ticket IDs (comma separated) from Confluence.
+    The tickets are looked up concurrently and pages shared between them are fetched once.
+    Returns a formatted string with the ticket details and relevant page excerpts,
+    one section per ticket, or with output_format="json" a compact JSON object.
     """
+    as_json = _is_json(output_format)
+    ticket_ids = [t.strip() for t in re.split(r"[,;\n]", ticket_id) if t.strip()]
     try:
-        creds = get_confluence_connection()
+        confluence = get_confluence_connector()
+        contexts = confluence.get_ticket_contexts(ticket_ids)
     except Exception as e:
-        return f"Error: {str(e)}"
+        return _error(e, as_json)
+
+    if as_json:
+        page_fields = _fields(fields, PAGE_FIELDS)
+        tickets = []
+        for ticket_id in ticket_ids:
+            context = contexts.get(ticket_id) or {}
+            ticket = context.get("ticket")
+            if not ticket:
+                tickets.append({"key": ticket_id, "error": "no page found"})
+                continue
+            tickets.append({
+                "key": ticket_id,
+                "summary": ticket["summary"],
+                "id": ticket["page_id"],
+                "pages": [
+                    _record(_page_values(doc.metadata, doc.page_content), page_fields, max_chars)
+                    for doc in context.get("docs", [])
+                ],
+            })
+        return _dump({"tickets": tickets})
+
+    sections = []
+    for ticket_id in ticket_ids:
+        sections.append(format_ticket_context(ticket_id, contexts.get(ticket_id) or {}, max_chars))
+    return "\n\n".join(sections)
 
-    # 1. Fetch Ticket Details
-    # Initialize Confluence Connector
-    confluence = ConfluenceConnector(creds["url"], creds["username"], creds["api_token"])
-    ticket = confluence.get_ticket_page(ticket_id)
-    
-    if not ticket:
-        return f"Failed to fetch ticket details for {ticket_id} from Confluence."
-        
-    output = []
-    output.append(f"Ticket Summary (Page Title): {ticket['summary']}")
-    
-    # 2. Formulate Search Query
-    search_query = ticket_id
-    output.append(f"Searching Confluence for: {search_query}")
-    
-    # 3. Search Confluence
-    docs = confluence.search_pages(search_query)
-    
-    # Filter: Ensure Ticket ID is actually in the content (Strict Check)
-    filtered_docs = []
-    for doc in docs:
-        if ticket_id in doc.page_content:
-            filtered_docs.append(doc)
-            
-    docs = filtered_docs
-    
-    output.append(f"Found {len(docs)} relevant pages matching {ticket_id}.")
-    for doc in docs:
-        output.append(f" - {doc.metadata['title']} ({doc.metadata['source']})")
-    
-    # Alternative: Show Extracted Output
-    output.append("\n=== Extracted Content ===\n")
-    for i, doc in enumerate(docs):
-        output.append(f"--- Document {i+1}: {doc.metadata['title']} ---")
-        # Limit content length for readability in output
-        content_preview = doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content
-        output.append(content_preview)
-        output.append("\n")
-    output.append("=========================")
-    
-    return "\n".join(output)
 
 # --- Tool Definitions ---
 @tool(
@@ -253,25 +196,36 @@ def get_ticket_context(ticket_id: str) -> str:
         ExpectedCredentials(app_id="confluence_creds", type=ConnectionType.KEY_VALUE)
     ],
 )
-def confluence_search_pages(query: str, limit: int = 5) -> str:
+@traced("tool.confluence_search_pages")
+def confluence_search_pages(query: str, limit: int = 5, output_format: str = "", fields: str = "",
+                            max_chars: int = 300) -> str:
     """
     Searches for pages in Confluence using CQL (Confluence Query Language).
     
     Args:
         query: The search query to find relevant pages.
         limit: Maximum number of pages to return (default: 5).
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+        fields: JSON fields to return per page, comma separated, from id,title,url,text (default: all).
+        max_chars: Maximum characters of page text per page, 0 for no limit (default: 300).
         
     Returns:
-        A formatted string with page titles, links, and content excerpts.
+        A formatted string with page titles, links, and content excerpts. Page ids can be
+        expanded to the full text with confluence_get_page.
     """
+    as_json = _is_json(output_format)
     try:
-        creds = get_confluence_connection()
+        confluence = get_confluence_connector()
+        docs = confluence.search_pages(query, limit=limit)
     except Exception as e:
-        return f"Error: {str(e)}"
-    
-    confluence = ConfluenceConnector(creds["url"], creds["username"], creds["api_token"])
-    docs = confluence.search_pages(query, limit=limit)
-    
+        return _error(e, as_json)
+
+    if as_json:
+        page_fields = _fields(fields, PAGE_FIELDS)
+        return _dump({"query": query, "pages": [
+            _record(_page_values(doc.metadata, doc.page_content), page_fields, max_chars) for doc in docs
+        ]})
+
     if not docs:
         return f"No pages found matching query: {query}"
     
@@ -283,9 +237,8 @@ def confluence_search_pages(query: str, limit: int = 5) -> str:
         output.append(f"   Link: {doc.metadata['source']}")
         output.append(f"   Page ID: {doc.metadata['page_id']}")
         
-        # Show content preview (first 300 chars)
-        content_preview = doc.page_content[:300] + "..." if len(doc.page_content) > 300 else doc.page_content
-        output.append(f"   Preview: {content_preview}")
+        # Show content preview (first max_chars chars)
+        output.append(f"   Preview: {preview(doc.page_content, max_chars)}")
         output.append("")
     
     return "\n".join(output)
@@ -299,24 +252,34 @@ def confluence_search_pages(query: str, limit: int = 5) -> str:
         ExpectedCredentials(app_id="confluence_creds", type=ConnectionType.KEY_VALUE)
     ],
 )
-def confluence_get_ticket_page(ticket_id: str) -> str:
+@traced("tool.confluence_get_ticket_page")
+def confluence_get_ticket_page(ticket_id: str, output_format: str = "", fields: str = "", max_chars: int = 1000) -> str:
     """
     Retrieves a specific Confluence page by ticket ID.
     
     Args:
         ticket_id: The ID of the ticket to retrieve (e.g., PROJ-123, NB_0001).
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+        fields: JSON fields to return, comma separated, from key,summary,id,text (default: all).
+        max_chars: Maximum characters of the description, 0 for no limit (default: 1000).
         
     Returns:
         A formatted string with the ticket page details including title and description.
     """
+    as_json = _is_json(output_format)
     try:
-        creds = get_confluence_connection()
+        confluence = get_confluence_connector()
+        ticket = confluence.get_ticket_page(ticket_id)
     except Exception as e:
-        return f"Error: {str(e)}"
-    
-    confluence = ConfluenceConnector(creds["url"], creds["username"], creds["api_token"])
-    ticket = confluence.get_ticket_page(ticket_id)
-    
+        return _error(e, as_json)
+
+    if as_json:
+        if not ticket:
+            return _dump({"key": ticket_id, "error": "no page found"})
+        values = {"key": ticket["key"], "summary": ticket["summary"], "id": ticket["page_id"],
+                  "text": ticket["description"]}
+        return _dump(_record(values, _fields(fields, TICKET_FIELDS), max_chars))
+
     if not ticket:
         return f"No page found for ticket ID: {ticket_id}"
     
@@ -328,14 +291,65 @@ def confluence_get_ticket_page(ticket_id: str) -> str:
     
     # Show full description or truncate if too long
     description = ticket['description']
-    if len(description) > 1000:
-        output.append(description[:1000] + "...\n[Content truncated]")
+    if max_chars and len(description) > max_chars:
+        output.append(description[:max_chars] + "...\n[Content truncated]")
     else:
         output.append(description)
     
     return "\n".join(output)
 
 
+@tool(
+    name="confluence_get_page",
+    description="Returns the text of a Confluence page by page ID, in slices for long pages",
+    permission=ToolPermission.READ_ONLY,
+    expected_credentials=[
+        ExpectedCredentials(app_id="confluence_creds", type=ConnectionType.KEY_VALUE)
+    ],
+)
+@traced("tool.confluence_get_page")
+def confluence_get_page(page_id: str, offset: int = 0, max_chars: int = 4000, output_format: str = "") -> str:
+    """
+    Expands a page id returned by the other tools into the page's extracted text.
+    Long pages are returned max_chars at a time; call again with the returned next
+    offset to read on.
+
+    Args:
+        page_id: The Confluence page ID.
+        offset: Character offset to start reading from (default: 0).
+        max_chars: Maximum characters to return, 0 for the whole page (default: 4000).
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+    """
+    as_json = _is_json(output_format)
+    try:
+        confluence = get_confluence_connector()
+        doc = confluence.get_page(page_id)
+    except Exception as e:
+        return _error(e, as_json)
+
+    text = doc.page_content
+    offset = max(0, offset)
+    end = offset + max_chars if max_chars else len(text)
+    next_offset = end if end < len(text) else None
+
+    if as_json:
+        result = {"id": doc.metadata["page_id"], "title": doc.metadata["title"], "url": doc.metadata["source"],
+                  "offset": offset, "length": len(text), "text": text[offset:end]}
+        if next_offset is not None:
+            result["next_offset"] = next_offset
+        return _dump(result)
+
+    output = []
+    output.append(f"**{doc.metadata['title']}**")
+    output.append(f"Link: {doc.metadata['source']}")
+    output.append(f"Page ID: {doc.metadata['page_id']}")
+    output.append("")
+    output.append(text[offset:end])
+    if next_offset is not None:
+        output.append(f"\n[{len(text) - next_offset} more characters, continue with offset={next_offset}]")
+    return "\n".join(output)
+
+
 @tool(
     name="confluence_ticket_lookup",
     description="Retrieves context and relevant documentation for a given ticket ID from Confluence",
@@ -344,17 +358,40 @@ def confluence_get_ticket_page(ticket_id: str) -> str:
         ExpectedCredentials(app_id="confluence_creds", type=ConnectionType.KEY_VALUE)
     ],
 )
-def confluence_ticket_lookup(ticket_id: str) -> str:
+@traced("tool.confluence_ticket_lookup")
+def confluence_ticket_lookup(ticket_id: str, output_format: str = "", fields: str = "", max_chars: int = 500) -> str:
     """
     Retrieves context and relevant documentation for a given ticket ID from Confluence.
     
     Args:
-        ticket_id: The ID of the ticket to look up (e.g., NB_0001).
+        ticket_id: The ID of the ticket to look up (e.g., NB_0001), or several IDs separated by commas.
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+        fields: JSON fields to return per related page, comma separated, from id,title,url,text (default: all).
+        max_chars: Maximum characters of text per related page, 0 for no limit (default: 500).
         
     Returns:
         A string containing the ticket summary and excerpts from relevant Confluence pages.
     """
-    return get_ticket_context(ticket_id)
+    return get_ticket_context(ticket_id, output_format=output_format, fields=fields, max_chars=max_chars)
+
+
+def _format_matches(identifier, pages, max_chars, max_snippets):
+    """Formats one person's contributor matches as markdown lines."""
+    if not pages:
+        return [f"No contributor matches found for '{identifier}'"]
+    output = [f"Found matches for '{identifier}':"]
+    for r in pages:
+        output.append(f"- {r['title']} ({r['source']})")
+        for snip in r['matches'][:max_snippets]:
+            output.append(f"    • {preview(snip, max_chars)}")
+    return output
+
+
+def _match_records(pages, fields, max_chars, max_snippets):
+    return [
+        _record(_page_values(r, snippets=r['matches'][:max_snippets]), fields, max_chars)
+        for r in pages
+    ]
 
 
 @tool(
@@ -365,28 +402,163 @@ def confluence_ticket_lookup(ticket_id: str) -> str:
         ExpectedCredentials(app_id="confluence_creds", type=ConnectionType.KEY_VALUE)
     ],
 )
-def confluence_search_contributor(identifier: str, limit: int = 20) -> str:
+@traced("tool.confluence_search_contributor")
+def confluence_search_contributor(identifier: str, limit: int = 20, output_format: str = "", fields: str = "",
+                                  max_chars: int = 500, max_snippets: int = 3) -> str:
     """
     Searches Confluence for occurrences of an employee name or email and returns a formatted
     summary with page titles, links, and content snippets where the identifier appears.
+
+    Args:
+        identifier: The employee's name or email.
+        limit: Maximum number of pages to scan (default: 20).
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+        fields: JSON fields to return per page, comma separated, from id,title,url,snippets (default: all).
+        max_chars: Maximum characters per snippet, 0 for no limit (default: 500).
+        max_snippets: Maximum snippets per page (default: 3).
     """
+    as_json = _is_json(output_format)
     try:
-        creds = get_confluence_connection()
+        confluence = get_confluence_connector()
+        results = confluence.search_employee_contributor(identifier, limit=limit)
     except Exception as e:
-        return f"Error: {str(e)}"
+        return _error(e, as_json)
+
+    if as_json:
+        return _dump({"identifier": identifier, "pages": _match_records(
+            results, _fields(fields, MATCH_FIELDS), max_chars, max_snippets
+        )})
 
-    confluence = ConfluenceConnector(creds["url"], creds["username"], creds["api_token"])
-    results = confluence.search_employee_contributor(identifier, limit=limit)
+    return "\n".join(_format_matches(identifier, results, max_chars, max_snippets))
 
-    if not results:
-        return f"No contributor matches found for '{identifier}'"
+
+@tool(
+    name="confluence_search_contributors",
+    description="Searches Confluence pages for several employee contributors at once by name or email",
+    permission=ToolPermission.READ_ONLY,
+    expected_credentials=[
+        ExpectedCredentials(app_id="confluence_creds", type=ConnectionType.KEY_VALUE)
+    ],
+)
+@traced("tool.confluence_search_contributors")
+def confluence_search_contributors(identifiers: str, limit: int = 200, output_format: str = "", fields: str = "",
+                                   max_chars: int = 500, max_snippets: int = 3) -> str:
+    """
+    Searches Confluence for occurrences of several employee names or emails in one pass and
+    returns, per person, the page titles, links, and content snippets where they appear.
+
+    Args:
+        identifiers: Names or emails separated by commas, semicolons or new lines.
+        limit: Maximum number of pages to scan across all people (default: 200).
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+        fields: JSON fields to return per page, comma separated, from id,title,url,snippets (default: all).
+        max_chars: Maximum characters per snippet, 0 for no limit (default: 500).
+        max_snippets: Maximum snippets per page (default: 3).
+    """
+    as_json = _is_json(output_format)
+    try:
+        confluence = get_confluence_connector()
+    except Exception as e:
+        return _error(e, as_json)
+
+    names = [name for name in re.split(r"[,;\n]", identifiers) if name.strip()]
+    if not names:
+        return _error("No identifiers given.", True) if as_json else "No identifiers given."
+
+    try:
+        results = confluence.search_contributors(names, limit=limit)
+    except Exception as e:
+        return _error(e, as_json)
+
+    if as_json:
+        match_fields = _fields(fields, MATCH_FIELDS)
+        return _dump({"results": [
+            {"identifier": identifier, "pages": _match_records(pages, match_fields, max_chars, max_snippets)}
+            for identifier, pages in results.items()
+        ]})
 
     output = []
-    output.append(f"Found matches for '{identifier}':")
-    for r in results:
-        output.append(f"- {r['title']} ({r['source']})")
-        for snip in r['matches'][:3]:
-            preview = snip if len(snip) <= 500 else snip[:500] + "..."
-            output.append(f"    • {preview}")
+    for identifier, pages in results.items():
+        output.extend(_format_matches(identifier, pages, max_chars, max_snippets))
+        if pages:
+            output.append("")
+
+    return "\n".join(output)
+
+
+@tool(
+    name="confluence_get_employee_profile",
+    description="Returns an employee's precomputed knowledge profile: owned pages, mentions with snippets, related tickets and last activity",
+    permission=ToolPermission.READ_ONLY,
+)
+@traced("tool.confluence_get_employee_profile")
+def confluence_get_employee_profile(employee: str, max_pages: int = 10, output_format: str = "", fields: str = "",
+                                    max_chars: int = 300, max_snippets: int = 2) -> str:
+    """
+    Returns the precomputed profile of an employee in one call: the pages they own
+    (listed as owner/contributor), other pages mentioning them with snippets, related
+    Jira and ticket references, and when they last touched any of it.
+    Profiles are built offline from the synced index and are only available where that
+    was run; otherwise, or if none exists for the employee, use
+    confluence_search_contributors or confluence_search_pages.
+
+    Args:
+        employee: The employee's full name or email.
+        max_pages: Maximum number of owned and mentioning pages to list each (default: 10).
+        output_format: "markdown" or "json" for compact results (default: HRABBIT_TOOL_OUTPUT).
+        fields: JSON fields to return per page, comma separated, from id,title,url,modified,snippets (default: all).
+        max_chars: Maximum characters per snippet, 0 for no limit (default: 300).
+        max_snippets: Maximum snippets per page (default: 2).
+    """
+    as_json = _is_json(output_format)
+    try:
+        store = get_profile_store()
+        profile = store.get_profile(employee) if store else None
+    except Exception as e:
+        return _error(e, as_json)
+    if store is None:
+        message = ("Employee profiles are not available in this deployment; do not call this tool again. "
+                   "Use confluence_search_contributors with the employee's full name (or several names "
+                   "at once), or confluence_search_pages, to search Confluence live.")
+        return _dump({"employee": employee, "error": message}) if as_json else message
+    if profile is None:
+        message = (f"No precomputed profile for '{employee}'. Use confluence_search_contributors "
+                   f"or confluence_search_pages with the employee's full name to search Confluence live.")
+        return _dump({"employee": employee, "error": message}) if as_json else message
+
+    built = time.strftime("%Y-%m-%d %H:%M", time.localtime(profile["built_at"]))
+    sections = (("owned_pages", "Owned pages", profile["owned_pages"]), ("mentions", "Mentioned on", profile["mentions"]))
+
+    if as_json:
+        page_fields = _fields(fields, PROFILE_PAGE_FIELDS)
+        result = {"employee": profile["employee"], "built": built, "last_touched": profile["last_touched"]}
+        for key, _, pages in sections:
+            result[key] = [
+                _record({**_page_values(page, snippets=page["snippets"][:max_snippets]),
+                         "modified": page["last_modified"]}, page_fields, max_chars)
+                for page in pages[:max_pages]
+            ]
+            if len(pages) > max_pages:
+                result[f"{key}_more"] = len(pages) - max_pages
+        result["tickets"] = [{k: v for k, v in ticket.items() if v} for ticket in profile["tickets"]]
+        return _dump(result)
+
+    output = [f"Profile for '{profile['employee']}' (built {built}, last touched {profile['last_touched'] or 'unknown'})"]
+
+    for _, heading, pages in sections:
+        output.append(f"\n{heading} ({len(pages)}):")
+        for page in pages[:max_pages]:
+            output.append(f"- {page['title']} ({page['source']}), page id {page['page_id']}, "
+                          f"modified {page['last_modified'] or 'unknown'}")
+            for snip in page["snippets"][:max_snippets]:
+                output.append(f"    • {preview(snip, max_chars)}")
+        if len(pages) > max_pages:
+            output.append(f"  ... and {len(pages) - max_pages} more")
+
+    output.append(f"\nRelated tickets ({len(profile['tickets'])}):")
+    for ticket in profile["tickets"]:
+        details = ", ".join(part for part in (ticket["status"], ticket["role"], ticket["updated"]) if part)
+        summary = f": {ticket['summary']}" if ticket["summary"] else ""
+        output.append(f"- {ticket['key']}{summary} ({details})")
 
     return "\n".join(output)